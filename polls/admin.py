@@ -1,11 +1,92 @@
-from polls.models import Poll, Choice
+from django.conf import settings
+from django.contrib.admin.views.main import ChangeList
+from django.db import connections
+from django.db.models.query import QuerySet
+from polls.db import estimated_count
+from polls.models import Poll, Choice, VoteShard, VoteEvent
 from django.contrib import admin
 
+class EstimatedCountQuerySet(QuerySet):
+    """
+    Counts unfiltered querysets of large tables from the table's estimated
+    size rather than with a full COUNT(*), for the changelist's paginator.
+    """
+
+    def count(self):
+        if self._result_cache is None and not self.query.where:
+            estimate = estimated_count(self)
+            if estimate is not None and estimate >= settings.POLLS_ADMIN_ESTIMATED_COUNT_ABOVE:
+                return estimate
+        return super(EstimatedCountQuerySet, self).count()
+
+def question_prefix(queryset, prefix):
+    """
+    Filters ``queryset`` to the polls whose question starts with ``prefix``,
+    ignoring case. SQLite never runs Django's bound LIKE ... ESCAPE from the
+    NOCASE question index, so there it is a range of the index instead.
+    """
+    if connections[queryset.db].vendor != 'sqlite' or prefix.endswith(u'\uffff'):
+        return queryset.filter(question__istartswith=prefix)
+    # NOCASE only folds ASCII letters, to lower case.
+    low = u''.join(c.lower() if c < u'\x80' else c for c in unicode(prefix))
+    successor = unichr(ord(low[-1]) + 1)
+    if u'A' <= successor <= u'Z':
+        # After '@' comes 'A', which NOCASE sorts as 'a': '[' is next.
+        successor = u'['
+    high = low[:-1] + successor
+    column = '%s.question' % (connections[queryset.db].ops.quote_name(Poll._meta.db_table),)
+    return queryset.extra(
+        where=['%s >= %%s COLLATE NOCASE AND %s < %%s COLLATE NOCASE' % (column, column)],
+        params=[low, high])
+
+class PollChangeList(ChangeList):
+
+    def get_query_set(self, request):
+        # The whole search box is one question prefix.
+        query, self.query = self.query, ''
+        try:
+            queryset = super(PollChangeList, self).get_query_set(request)
+        finally:
+            self.query = query
+        if query.strip():
+            queryset = question_prefix(queryset, query.strip())
+        return queryset
+
 class ChoiceInline(admin.StackedInline):
     model = Choice
     extra = 3
 
 class PollAdmin(admin.ModelAdmin):
     inlines = [ChoiceInline]
+    list_display = ('question', 'pub_date', 'total_votes')
+    # A prefix search, which the question index serves (see PollChangeList).
+    search_fields = ('^question',)
+    date_hierarchy = 'pub_date'
+
+    def get_changelist(self, request, **kwargs):
+        return PollChangeList
+
+    def queryset(self, request):
+        queryset = super(PollAdmin, self).queryset(request)
+        condition, params = VoteEvent.objects.unrolled_condition()
+        # Votes of sharded and event log polls that are not rolled up yet.
+        # Only the rows of the page shown are looked up.
+        unrolled = (
+            '(SELECT COALESCE(SUM(s.votes), 0) FROM %(shard)s s'
+            ' INNER JOIN %(choice)s c ON s.choice_id = c.id WHERE c.poll_id = %(poll)s.id)'
+            ' + (SELECT COUNT(*) FROM %(event)s WHERE %(event)s.poll_id = %(poll)s.id AND %(condition)s)'
+            % {
+                'shard': VoteShard._meta.db_table,
+                'choice': Choice._meta.db_table,
+                'event': VoteEvent._meta.db_table,
+                'poll': Poll._meta.db_table,
+                'condition': condition,
+            })
+        return queryset.extra(select={'unrolled_votes': unrolled}, select_params=params) \
+                ._clone(klass=EstimatedCountQuerySet)
+
+    def total_votes(self, poll):
+        return poll.votes + poll.unrolled_votes
+    total_votes.admin_order_field = 'votes'
 
 admin.site.register(Poll, PollAdmin)
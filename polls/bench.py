@@ -0,0 +1,180 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.client import Client, ClientHandler
+from django.test.utils import override_settings
+from polls.factories import PollFactory, ChoiceFactory
+from polls.importer import bulk_create
+from polls.models import Choice, recount_votes
+from polls.search import index_polls
+from polls.wsgi import VoteHandlerMixin
+
+@contextmanager
+def test_database():
+    """
+    Runs the block against a freshly created test database, so that
+    benchmarks never touch real data.
+    """
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+def seed(polls, choices, votes, rng=random):
+    """
+    Creates ``polls`` polls with ``choices`` choices each, and spreads
+    ``votes`` votes per poll randomly over its choices. Returns
+    {poll_id: [choice_id, ...]}.
+    """
+    poll_ids = []
+    for _ in range(polls):
+        poll = PollFactory.create()
+        counts = [0] * choices
+        for _ in range(votes if choices else 0):
+            counts[rng.randrange(choices)] += 1
+        bulk_create(Choice, [ChoiceFactory.build(poll=poll, votes=count)
+                              for count in counts])
+        poll_ids.append(poll.id)
+    recount_votes(poll_ids)
+    index_polls(poll_ids)
+
+    dataset = dict((poll_id, []) for poll_id in poll_ids)
+    for poll_id, choice_id in Choice.objects.values_list('poll', 'id'):
+        dataset[poll_id].append(choice_id)
+    return dataset
+
+def percentile(values, percent):
+    values = sorted(values)
+    if not values:
+        return None
+    index = int(round(percent / 100.0 * (len(values) - 1)))
+    return values[index]
+
+class VoteClientHandler(VoteHandlerMixin, ClientHandler):
+    pass
+
+class VoteClient(Client):
+    """
+    A test client whose requests go through polls.wsgi's vote profile.
+    """
+
+    def __init__(self, enforce_csrf_checks=False, **defaults):
+        super(VoteClient, self).__init__(enforce_csrf_checks, **defaults)
+        self.handler = VoteClientHandler(enforce_csrf_checks)
+
+def run_scenario(make_request, requests, concurrency=1, client_class=Client):
+    """
+    Sends ``requests`` requests built by ``make_request(client, rng)`` from
+    ``concurrency`` threads, each with its own test client and database
+    connection, and returns their latencies, query counts and throughput.
+    The clients are instances of ``client_class``.
+    With a concurrency of 1 the requests are sent from the calling thread.
+    """
+    latencies, queries, errors = [], [], []
+    lock = threading.Lock()
+
+    def worker(count, seed):
+        client, rng = client_class(), random.Random(seed)
+        for _ in range(count):
+            started = time.time()
+            try:
+                response = make_request(client, rng)
+            except Exception, e:
+                with lock:
+                    errors.append(repr(e))
+                continue
+            elapsed = time.time() - started
+            with lock:
+                latencies.append(elapsed)
+                if response.status_code >= 400:
+                    errors.append(response.status_code)
+                if response.has_header('X-Polls-Queries'):
+                    queries.append(int(response['X-Polls-Queries']))
+
+    def thread_worker(count, seed):
+        try:
+            worker(count, seed)
+        finally:
+            connection.close()
+
+    shares = [requests // concurrency + (1 if i < requests % concurrency else 0)
+              for i in range(concurrency)]
+    started = time.time()
+    with override_settings(POLLS_METRICS_HEADERS=True, POLLS_METRICS_SQL=True):
+        if concurrency == 1:
+            worker(requests, 0)
+        else:
+            threads = [threading.Thread(target=thread_worker, args=(share, i))
+                       for i, share in enumerate(shares)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+    elapsed = time.time() - started
+
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': len(errors),
+        'throughput_rps': len(latencies) / elapsed if elapsed else None,
+        'latency_ms': dict(
+            ('p%d' % p, percentile(latencies, p) * 1000 if latencies else None)
+            for p in (50, 95, 99)),
+        'queries': {
+            'mean': sum(queries) / float(len(queries)) if queries else None,
+            'max': max(queries) if queries else None,
+        },
+    }
+
+def run_mixed(read, write, readers, writers, seconds):
+    """
+    Calls ``read(rng)`` from ``readers`` threads and ``write(rng)`` from
+    ``writers`` threads, each on its own database connection, for
+    ``seconds`` seconds, and returns the latencies and error counts of both.
+    """
+    latencies = {'read': [], 'write': []}
+    errors = {'read': [], 'write': []}
+    lock = threading.Lock()
+    deadline = time.time() + seconds
+
+    def worker(kind, operation, seed):
+        rng = random.Random(seed)
+        try:
+            while time.time() < deadline:
+                started = time.time()
+                try:
+                    operation(rng)
+                except Exception, e:
+                    with lock:
+                        errors[kind].append(repr(e))
+                    continue
+                with lock:
+                    latencies[kind].append(time.time() - started)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=('read', read, i))
+               for i in range(readers)]
+    threads += [threading.Thread(target=worker, args=('write', write, readers + i))
+                for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    report = {}
+    for kind in ('read', 'write'):
+        report[kind] = {
+            'operations': len(latencies[kind]),
+            'errors': len(errors[kind]),
+            'first_error': errors[kind][0] if errors[kind] else None,
+            'throughput_ops': len(latencies[kind]) / float(seconds),
+            'latency_ms': dict(
+                ('p%d' % p, percentile(latencies[kind], p) * 1000 if latencies[kind] else None)
+                for p in (50, 95, 99)),
+        }
+    return report
@@ -0,0 +1,155 @@
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from polls.models import Poll, Choice
+from polls.routers import use_primary
+from polls.votes import record_vote
+
+logger = logging.getLogger('polls.buffer')
+
+PROCESSES_KEY = 'polls:vote-buffer:processes'
+
+class VoteBuffer(object):
+    """
+    Accumulates votes in memory and writes them with one grouped
+    record_vote() per choice.
+
+    A flush happens every ``flush_interval_ms`` milliseconds from a
+    background thread, as soon as ``max_pending`` votes are waiting, and
+    when the process exits. Those two settings bound how many votes a
+    crashed process can lose and how long a vote stays invisible. Votes
+    that fail to flush are kept for the next flush, up to ``max_pending``;
+    the rest are dropped and counted in ``dropped_votes``.
+    """
+
+    def __init__(self, enabled=False, flush_interval_ms=500, max_pending=100):
+        self.enabled = enabled
+        self.flush_interval_ms = flush_interval_ms
+        self.max_pending = max_pending
+        self.depth = 0
+        self.flushed_votes = 0
+        self.dropped_votes = 0
+        self.last_flush_at = None
+        self.last_flush_latency_ms = None
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    @classmethod
+    def from_settings(cls):
+        options = getattr(settings, 'POLLS_VOTE_BUFFER', {})
+        return cls(enabled=options.get('ENABLED', False),
+                   flush_interval_ms=options.get('FLUSH_INTERVAL_MS', 500),
+                   max_pending=options.get('MAX_PENDING', 100))
+
+    def add(self, poll_id, choice_id, count=1):
+        with self._lock:
+            key = (poll_id, choice_id)
+            self._pending[key] = self._pending.get(key, 0) + count
+            self.depth += count
+            full = self.depth >= self.max_pending
+        if full:
+            self.flush()
+        else:
+            self.start()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self.depth = 0
+        if not pending:
+            return 0
+
+        started = time.time()
+        with use_primary():
+            polls = Poll.objects.in_bulk(set(poll_id for poll_id, _ in pending))
+        flushed = 0
+        for (poll_id, choice_id), count in pending.items():
+            if poll_id not in polls:
+                continue
+            try:
+                record_vote(polls[poll_id], choice_id, count)
+            except Choice.DoesNotExist:
+                continue
+            except Exception:
+                self._requeue(poll_id, choice_id, count)
+                logger.exception('Could not flush %d votes for choice %s',
+                        count, choice_id)
+                continue
+            flushed += count
+
+        self.flushed_votes += flushed
+        self.last_flush_at = time.time()
+        self.last_flush_latency_ms = (self.last_flush_at - started) * 1000
+        return flushed
+
+    def _requeue(self, poll_id, choice_id, count):
+        with self._lock:
+            kept = min(count, max(self.max_pending - self.depth, 0))
+            if kept:
+                key = (poll_id, choice_id)
+                self._pending[key] = self._pending.get(key, 0) + kept
+                self.depth += kept
+            self.dropped_votes += count - kept
+        if kept < count:
+            logger.error('Dropped %d votes for choice %s: the buffer is full',
+                    count - kept, choice_id)
+
+    def start(self):
+        if self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._run)
+            self._flusher.daemon = True
+            self._flusher.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval_ms / 1000.0)
+            try:
+                self.flush()
+                self.publish_stats()
+            except Exception:
+                logger.exception('Vote buffer flush failed')
+
+    def stats(self):
+        return {
+            'host': socket.gethostname(),
+            'pid': os.getpid(),
+            'depth': self.depth,
+            'flushed_votes': self.flushed_votes,
+            'dropped_votes': self.dropped_votes,
+            'last_flush_at': self.last_flush_at,
+            'last_flush_latency_ms': self.last_flush_latency_ms,
+        }
+
+    def publish_stats(self):
+        """
+        Stores this process' stats in the cache, where the pollstats
+        command can read them. This needs a cache shared between processes.
+        """
+        stats = self.stats()
+        key = 'polls:vote-buffer:%s:%d' % (stats['host'], stats['pid'])
+        timeout = max(60, 10 * self.flush_interval_ms / 1000)
+        cache.set(key, stats, timeout)
+        processes = cache.get(PROCESSES_KEY, [])
+        if key not in processes:
+            cache.set(PROCESSES_KEY, processes + [key])
+
+def published_stats():
+    processes = cache.get(PROCESSES_KEY, [])
+    stats = cache.get_many(processes)
+    if len(stats) != len(processes):
+        cache.set(PROCESSES_KEY, [key for key in processes if key in stats])
+    return [stats[key] for key in processes if key in stats]
+
+vote_buffer = VoteBuffer.from_settings()
@@ -0,0 +1,106 @@
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+
+VERSION_KEY = 'polls:results-version:%s'
+HOME_VERSION_KEY = 'polls:home-version'
+RESULTS_KEY = 'polls:results:%s:%s'
+HITS_KEY = 'polls:results-cache:hits'
+MISSES_KEY = 'polls:results-cache:misses'
+
+# Version keys must outlive the results cached under them.
+VERSION_TIMEOUT = 30 * 24 * 60 * 60
+
+def _new_version():
+    # A version key that was evicted restarts from a random value, so it
+    # cannot land on results cached under its previous life.
+    return random.randint(1, 2 ** 30)
+
+def versions_shared():
+    """
+    Whether every process sees the same versions. A vote only bumps the
+    version in its own process' local-memory cache, so results, ETags and
+    live updates based on versions are only used with a shared cache, or
+    when POLLS_ALLOW_LOCAL_CACHE says a single process serves the site.
+    """
+    return not isinstance(cache, LocMemCache) or settings.POLLS_ALLOW_LOCAL_CACHE
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), VERSION_TIMEOUT)
+        version = cache.get(key)
+    return version
+
+def _bump_version(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, _new_version(), VERSION_TIMEOUT)
+        return cache.get(key)
+
+def results_version(poll_id):
+    return _version(VERSION_KEY % (poll_id,))
+
+def bump_results_version(poll_id):
+    return _bump_version(VERSION_KEY % (poll_id,))
+
+def home_version():
+    return _version(HOME_VERSION_KEY)
+
+def bump_home_version():
+    return _bump_version(HOME_VERSION_KEY)
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0)
+        cache.incr(key)
+
+def get_results(poll_id, build):
+    """
+    Returns the value cached for the current results version of a poll,
+    calling ``build()`` to compute and store it on a miss. Without shared
+    versions it always calls ``build()``.
+    """
+    if not versions_shared():
+        return build()
+    key = RESULTS_KEY % (poll_id, results_version(poll_id))
+    value = cache.get(key)
+    if value is None:
+        _count(MISSES_KEY)
+        value = build()
+        cache.set(key, value, settings.POLLS_RESULTS_CACHE_TIMEOUT)
+    else:
+        _count(HITS_KEY)
+    return value
+
+def prefill_results(poll_ids, build_many):
+    """
+    Stores ``build_many(poll_ids)``, a {poll_id: value} dict, as what
+    get_results() would cache for each poll, and returns the dict.
+    """
+    if not versions_shared():
+        return build_many(poll_ids)
+    # Like get_results(), reads the versions before the data, so a vote
+    # cast in between leaves the stored value under an old version.
+    versions = dict((poll_id, results_version(poll_id)) for poll_id in poll_ids)
+    values = build_many(poll_ids)
+    cache.set_many(dict((RESULTS_KEY % (poll_id, versions[poll_id]), value)
+                        for poll_id, value in values.items()),
+                   settings.POLLS_RESULTS_CACHE_TIMEOUT)
+    return values
+
+def cached_results(poll_id, version):
+    """
+    Returns what get_results() cached for a given version of a poll's
+    results, or None if it is gone.
+    """
+    return cache.get(RESULTS_KEY % (poll_id, version))
+
+def stats():
+    counts = cache.get_many([HITS_KEY, MISSES_KEY])
+    return {'hits': counts.get(HITS_KEY, 0), 'misses': counts.get(MISSES_KEY, 0)}
@@ -0,0 +1,101 @@
+import math
+
+from django.conf import settings
+from django.core import signals
+from django.db import close_connection, connections, transaction, DatabaseError
+from django.db.backends.signals import connection_created
+
+DEFAULT_SQLITE_OPTIONS = {
+    'JOURNAL_MODE': 'WAL',
+    'SYNCHRONOUS': 'NORMAL',
+    'CACHE_SIZE_KB': 16 * 1024,
+    'BUSY_TIMEOUT_MS': 5000,
+    'PERSISTENT_CONNECTIONS': True,
+}
+
+def sqlite_options():
+    options = dict(DEFAULT_SQLITE_OPTIONS)
+    options.update(getattr(settings, 'POLLS_SQLITE', {}))
+    return options
+
+def sqlite_pragmas(options=None):
+    options = options or sqlite_options()
+    pragmas = []
+    if options['BUSY_TIMEOUT_MS'] is not None:
+        pragmas.append('PRAGMA busy_timeout = %d' % options['BUSY_TIMEOUT_MS'])
+    if options['JOURNAL_MODE']:
+        pragmas.append('PRAGMA journal_mode = %s' % options['JOURNAL_MODE'])
+    if options['SYNCHRONOUS']:
+        pragmas.append('PRAGMA synchronous = %s' % options['SYNCHRONOUS'])
+    if options['CACHE_SIZE_KB']:
+        # A negative cache_size is in KiB rather than pages.
+        pragmas.append('PRAGMA cache_size = -%d' % options['CACHE_SIZE_KB'])
+    return pragmas
+
+def logaddexp(a, b):
+    """
+    log(exp(a) + exp(b)), where None stands for log(0).
+    """
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return max(a, b) + math.log1p(math.exp(-abs(a - b)))
+
+def configure_sqlite(sender, connection, **kwargs):
+    """
+    Sets up every new SQLite connection for concurrent use: in WAL mode
+    readers no longer wait for a vote being written, and the busy timeout
+    makes writers queue up instead of failing with "database is locked".
+    It also registers the polls_logaddexp() SQL function that trending
+    scores are updated with.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    cursor = connection.connection.cursor()
+    for pragma in sqlite_pragmas():
+        cursor.execute(pragma)
+    cursor.close()
+    connection.connection.create_function('polls_logaddexp', 2, logaddexp)
+
+def release_connections(**kwargs):
+    """
+    Replaces django.db.close_connection at the end of a request. SQLite
+    connections are cheap to keep but comparatively slow to set up, so
+    they are only rolled back and reused by the thread's next request.
+    """
+    for conn in connections.all():
+        if conn.vendor != 'sqlite' or conn.connection is None:
+            conn.close()
+            continue
+        try:
+            transaction.rollback_unless_managed(using=conn.alias)
+        except DatabaseError:
+            conn.close()
+
+def install():
+    connection_created.connect(configure_sqlite, dispatch_uid='polls.db.configure_sqlite')
+    if sqlite_options()['PERSISTENT_CONNECTIONS']:
+        signals.request_finished.disconnect(close_connection)
+        signals.request_finished.connect(release_connections,
+                dispatch_uid='polls.db.release_connections')
+
+def estimated_count(queryset):
+    """
+    Returns a cheap estimate of the number of rows in the table of
+    ``queryset``'s model, or None when the database cannot give one.
+
+    SQLite's estimate is the highest rowid, which overcounts deleted rows.
+    """
+    connection = connections[queryset.db]
+    table = connection.ops.quote_name(queryset.model._meta.db_table)
+    cursor = connection.cursor()
+    if connection.vendor == 'sqlite':
+        cursor.execute('SELECT MAX(rowid) FROM %s' % table)
+    elif connection.vendor == 'postgresql':
+        cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table])
+    else:
+        return None
+    row = cursor.fetchone()
+    return int(row[0] or 0) if row else None
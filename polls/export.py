@@ -0,0 +1,60 @@
+import csv
+import json
+
+from polls.models import Poll, Choice, pending_votes
+
+FIELDS = ('poll_id', 'question', 'pub_date', 'choice_id', 'choice', 'votes')
+
+def export_rows(chunk_size=500):
+    """
+    Yields one dict per choice, and one per poll without choices, walking
+    the polls in primary key order ``chunk_size`` polls at a time so that
+    memory use does not grow with the size of the tables.
+    """
+    last_id = 0
+    while True:
+        polls = list(Poll.objects.filter(pk__gt=last_id).order_by('pk')
+                .values_list('id', 'question', 'pub_date', 'vote_mode')[:chunk_size])
+        if not polls:
+            return
+        last_id = polls[-1][0]
+
+        choices = dict((poll[0], []) for poll in polls)
+        rows = Choice.objects.filter(poll__in=choices.keys()).order_by('id') \
+                .values_list('poll', 'id', 'choice', 'votes')
+        for poll_id, choice_id, choice, votes in rows:
+            choices[poll_id].append((choice_id, choice, votes))
+        pending = pending_votes((poll[0], poll[3]) for poll in polls)
+
+        for poll_id, question, pub_date, _ in polls:
+            poll = {'poll_id': poll_id, 'question': question,
+                    'pub_date': pub_date.isoformat()}
+            if not choices[poll_id]:
+                yield dict(poll, choice_id=None, choice=None, votes=None)
+            for choice_id, choice, votes in choices[poll_id]:
+                yield dict(poll, choice_id=choice_id, choice=choice,
+                           votes=votes + pending.get(choice_id, 0))
+
+class _Echo(object):
+    def write(self, value):
+        return value
+
+def _encode(value):
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(FIELDS)
+    for row in rows:
+        yield writer.writerow([_encode(row[field]) for field in FIELDS])
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row) + '\n'
+
+FORMATS = {
+    'csv': (csv_lines, 'text/csv'),
+    'ndjson': (ndjson_lines, 'application/x-ndjson'),
+}
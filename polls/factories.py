@@ -0,0 +1,16 @@
+import factory
+from django.utils import timezone
+from polls.models import Poll, Choice
+
+class PollFactory(factory.Factory):
+    FACTORY_FOR = Poll
+
+    question = factory.Sequence(lambda n: 'Poll number %s?' % n)
+    pub_date = factory.LazyAttribute(lambda poll: timezone.now())
+
+class ChoiceFactory(factory.Factory):
+    FACTORY_FOR = Choice
+
+    poll = factory.SubFactory(PollFactory)
+    choice = factory.Sequence(lambda n: 'Choice %s' % n)
+    votes = 0
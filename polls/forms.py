@@ -1,8 +1,15 @@
 from django import forms
 
 class PollVoteForm(forms.Form):
-    vote = forms.ChoiceField(widget=forms.RadioSelect())
+    vote = forms.TypedChoiceField(widget=forms.RadioSelect(), coerce=int)
 
-    def __init__(self, poll):
-        forms.Form.__init__(self)
-        self.fields['vote'].choices = [(c.id, c.choice) for c in poll.choice_set.all()]
+    def __init__(self, poll, choices=None, data=None):
+        """
+        ``choices`` may be passed in when the poll's choices are already
+        loaded, e.g. from its cached results, to save another query. The
+        submitted vote is validated against them and cleaned to a choice id.
+        """
+        forms.Form.__init__(self, data)
+        if choices is None:
+            choices = poll.choice_set.all()
+        self.fields['vote'].choices = [(c.id, c.choice) for c in choices]
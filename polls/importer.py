@@ -0,0 +1,125 @@
+import csv
+import json
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from polls.cache import bump_home_version
+from polls.models import Poll, Choice
+from polls.routers import use_primary
+from polls.search import index_polls
+
+# Keeps a single INSERT under SQLite's limits of 999 parameters and 500
+# compound SELECT terms.
+MAX_INSERT_PARAMS = 900
+MAX_INSERT_ROWS = 500
+
+class PollImportError(ValueError):
+    pass
+
+def _parse_pub_date(value, line):
+    pub_date = parse_datetime(value or '')
+    if pub_date is None:
+        raise PollImportError('Line %d: invalid pub_date %r' % (line, value))
+    if timezone.is_naive(pub_date):
+        pub_date = timezone.make_aware(pub_date, timezone.get_default_timezone())
+    return pub_date
+
+def read_ndjson(lines):
+    """
+    Yields (question, pub_date, [(choice, votes)]) for every line of the form
+    {"question": ..., "pub_date": ..., "choices": ["text", {"choice": "text", "votes": 3}]}
+    """
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+            choices = []
+            for choice in data.get('choices', []):
+                if isinstance(choice, dict):
+                    choices.append((choice['choice'], int(choice.get('votes', 0))))
+                else:
+                    choices.append((choice, 0))
+            question = data['question']
+        except (ValueError, KeyError, TypeError), e:
+            raise PollImportError('Line %d: %s' % (number, e))
+        yield question, _parse_pub_date(data.get('pub_date'), number), choices
+
+def read_csv(lines):
+    """
+    Yields (question, pub_date, [(choice, votes)]) from CSV rows with a
+    question,pub_date,choice[,votes] header. Consecutive rows with the same
+    question and pub_date make up one poll.
+    """
+    poll = None
+    for number, row in enumerate(csv.DictReader(lines), 2):
+        try:
+            question = row['question'].decode('utf-8')
+            pub_date = _parse_pub_date(row['pub_date'], number)
+            choice = (row.get('choice') or '').decode('utf-8')
+            votes = int(row.get('votes') or 0)
+        except (KeyError, ValueError), e:
+            raise PollImportError('Line %d: %s' % (number, e))
+        if poll is None or poll[:2] != (question, pub_date):
+            if poll is not None:
+                yield poll
+            poll = (question, pub_date, [])
+        if choice:
+            poll[2].append((choice, votes))
+    if poll is not None:
+        yield poll
+
+def bulk_create(model, objs):
+    fields = len([f for f in model._meta.local_fields if not f.primary_key])
+    size = min(MAX_INSERT_ROWS, MAX_INSERT_PARAMS // fields)
+    for start in range(0, len(objs), size):
+        model.objects.bulk_create(objs[start:start + size])
+
+def _import_batch(batch):
+    keys = dict(((question, pub_date), choices) for question, pub_date, choices in batch)
+    questions = set(question for question, _ in keys)
+    pub_dates = set(pub_date for _, pub_date in keys)
+
+    def existing():
+        polls = Poll.objects.filter(question__in=questions, pub_date__in=pub_dates) \
+                .values_list('id', 'question', 'pub_date')
+        return dict(((question, pub_date), poll_id) for poll_id, question, pub_date in polls
+                    if (question, pub_date) in keys)
+
+    # existing() must see the polls just inserted, which replicas may not.
+    with use_primary(), transaction.commit_on_success():
+        skipped = existing()
+        new = [key for key in keys if key not in skipped]
+        bulk_create(Poll, [
+            Poll(question=question, pub_date=pub_date,
+                 votes=sum(votes for _, votes in keys[question, pub_date]))
+            for question, pub_date in new])
+
+        poll_ids = existing()
+        choices = [Choice(poll_id=poll_ids[key], choice=choice, votes=votes)
+                   for key in new for choice, votes in keys[key]]
+        bulk_create(Choice, choices)
+        index_polls(poll_ids[key] for key in new)
+
+    if new:
+        bump_home_version()
+    return len(new), len(choices), len(skipped)
+
+def import_polls(polls, batch_size=250):
+    """
+    Inserts the (question, pub_date, [(choice, votes)]) tuples from ``polls``
+    with batched multi-row INSERTs, one transaction per batch, and yields
+    (polls, choices, skipped) counts for each batch.
+
+    A poll is identified by its question and pub_date. Polls that already
+    exist are skipped, so an interrupted import can simply be run again.
+    """
+    batch = []
+    for poll in polls:
+        batch.append(poll)
+        if len(batch) >= batch_size:
+            yield _import_batch(batch)
+            batch = []
+    if batch:
+        yield _import_batch(batch)
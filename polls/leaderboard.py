@@ -0,0 +1,116 @@
+import datetime
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.utils import timezone
+from polls.db import logaddexp
+from polls.models import Poll, VoteBucket, recount_votes
+
+LEADERBOARDS_KEY = 'polls:leaderboards:%d'
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def _decay_rate():
+    return math.log(2) / settings.POLLS_TRENDING_HALF_LIFE
+
+def trending_score(votes, when):
+    """
+    The log of ``votes`` votes cast at ``when``, weighted by a weight that
+    doubles every POLLS_TRENDING_HALF_LIFE seconds.
+
+    A poll's trending score is the log of the sum of its votes' weights. As
+    every score decays at the same rate, comparing scores compares how much
+    each poll was voted on recently, and a score only has to change when
+    its poll gets votes. Keeping it in log space keeps the weights of
+    recent votes from overflowing.
+    """
+    delta = when - EPOCH
+    return math.log(votes) + _decay_rate() * (delta.days * 86400 + delta.seconds)
+
+def bump_poll_sql(connection):
+    """
+    SQL adding %s votes to a poll's total and the log of their weight, %s,
+    to its trending score, for the poll with id %s.
+    """
+    if connection.vendor == 'sqlite':
+        trending = 'polls_logaddexp(trending, %s)'
+    else:
+        trending = ('CASE WHEN trending IS NULL THEN %s ELSE GREATEST(trending, %s) '
+                    '+ LN(1 + EXP(-ABS(trending - %s))) END')
+    return 'UPDATE %s SET votes = votes + %%s, trending = %s WHERE id = %%s' % (
+            Poll._meta.db_table, trending)
+
+def bump_poll(using, poll_id, votes, when):
+    connection = connections[using]
+    score = trending_score(votes, when)
+    params = [votes] + [score] * (1 if connection.vendor == 'sqlite' else 3) + [poll_id]
+    connection.cursor().execute(bump_poll_sql(connection), params)
+    transaction.set_dirty(using=using)
+
+def top_polls(k):
+    """
+    The ``k`` polls with the most rolled up votes, read from the index on
+    Poll.votes.
+    """
+    return list(Poll.objects.order_by('-votes', '-id').only('id', 'question', 'votes')[:k])
+
+def trending_polls(k):
+    """
+    The ``k`` polls voted on the most lately, read from the index on
+    Poll.trending.
+    """
+    return list(Poll.objects.filter(trending__isnull=False).order_by('-trending', '-id')
+            .only('id', 'question', 'votes')[:k])
+
+def current_period():
+    return int(time.time() // settings.POLLS_LEADERBOARD_PERIOD)
+
+def leaderboards():
+    """
+    Returns (top polls, trending polls) as of the current
+    POLLS_LEADERBOARD_PERIOD and the period's number, which the home page's
+    ETag includes. Both lists are computed once per period.
+    """
+    period = current_period()
+    key = LEADERBOARDS_KEY % period
+    boards = cache.get(key)
+    if boards is None:
+        size = settings.POLLS_LEADERBOARD_SIZE
+        boards = (top_polls(size), trending_polls(size))
+        cache.set(key, boards, settings.POLLS_LEADERBOARD_PERIOD * 2)
+    return boards, period
+
+def rebuild_leaderboards(chunk_size=500):
+    """
+    Recomputes every poll's vote total from its choices and its trending
+    score from its hourly vote buckets, ``chunk_size`` polls at a time,
+    and returns the number of polls updated.
+    """
+    using = router.db_for_write(Poll)
+    connection = connections[using]
+    hour = VoteBucket.STEPS[VoteBucket.HOUR] // 2
+    last_id, rebuilt = 0, 0
+    while True:
+        poll_ids = list(Poll.objects.using(using).filter(pk__gt=last_id).order_by('pk')
+                .values_list('id', flat=True)[:chunk_size])
+        if not poll_ids:
+            return rebuilt
+        last_id = poll_ids[-1]
+
+        scores = dict((poll_id, None) for poll_id in poll_ids)
+        buckets = VoteBucket.objects.using(using).filter(
+                choice__poll__in=poll_ids, resolution=VoteBucket.HOUR, votes__gt=0) \
+                .values_list('choice__poll', 'start', 'votes')
+        for poll_id, start, votes in buckets:
+            # Votes of an hour are counted as cast in its middle.
+            scores[poll_id] = logaddexp(scores[poll_id], trending_score(votes, start + hour))
+
+        with transaction.commit_on_success(using=using):
+            recount_votes(poll_ids, using=using)
+            connection.cursor().executemany(
+                    'UPDATE %s SET trending = %%s WHERE id = %%s' % Poll._meta.db_table,
+                    [(score, poll_id) for poll_id, score in scores.items()])
+        rebuilt += len(poll_ids)
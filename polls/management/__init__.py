@@ -0,0 +1,16 @@
+import sys
+
+from django.db import connections
+from django.db.models.signals import post_syncdb
+from polls import models
+from polls.search import create_search_table
+
+def create_search_index(sender, db, verbosity=1, **kwargs):
+    # In a step of its own, so that a SQLite build without FTS5 only loses
+    # the search index.
+    if not create_search_table(db) and connections[db].vendor == 'sqlite' and verbosity >= 1:
+        sys.stderr.write('This SQLite build has no FTS5: poll search falls back to '
+                         'scanning questions.\n')
+
+post_syncdb.connect(create_search_index, sender=models,
+        dispatch_uid='polls.management.create_search_index')
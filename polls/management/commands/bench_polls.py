@@ -0,0 +1,85 @@
+import json
+import random
+import time
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand, CommandError
+from django.test.client import Client
+from polls import bench
+
+def home(dataset):
+    return lambda client, rng: client.get('/')
+
+def poll(dataset):
+    poll_ids = dataset.keys()
+    return lambda client, rng: client.get('/poll/%d/' % rng.choice(poll_ids))
+
+def vote(dataset):
+    poll_ids = [poll_id for poll_id, choices in dataset.items() if choices]
+    def make_request(client, rng):
+        poll_id = rng.choice(poll_ids)
+        # Only the POST: the poll page it redirects to is the poll scenario.
+        return client.post('/poll/%d/' % poll_id,
+                {'vote': str(rng.choice(dataset[poll_id]))})
+    return make_request
+
+def vote_endpoint(dataset):
+    poll_ids = [poll_id for poll_id, choices in dataset.items() if choices]
+    def make_request(client, rng):
+        poll_id = rng.choice(poll_ids)
+        return client.post('/poll/%d/vote/' % poll_id,
+                {'vote': str(rng.choice(dataset[poll_id]))})
+    return make_request
+
+# Scenario name: (requests, client class)
+SCENARIOS = {
+    'home': (home, Client),
+    'poll': (poll, Client),
+    'vote': (vote, Client),
+    'vote_endpoint': (vote_endpoint, bench.VoteClient),
+}
+
+class Command(NoArgsCommand):
+    help = ('Seeds a throwaway test database with polls, drives the home page, '
+            'poll pages and votes through the test client and prints latency '
+            'percentiles, throughput and query counts as JSON.')
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--polls', dest='polls', type='int', default=100,
+            help='Number of polls to create.'),
+        make_option('--choices', dest='choices', type='int', default=5,
+            help='Number of choices per poll.'),
+        make_option('--votes', dest='votes', type='int', default=100,
+            help='Number of votes per poll.'),
+        make_option('--requests', dest='requests', type='int', default=200,
+            help='Number of requests per scenario.'),
+        make_option('--concurrency', dest='concurrency', type='int', default=1,
+            help='Number of threads sending requests.'),
+        make_option('--scenarios', dest='scenarios', default='home,poll,vote,vote_endpoint',
+            help='Comma separated scenarios to run, among: %s.' % ', '.join(sorted(SCENARIOS))),
+        make_option('--seed', dest='seed', type='int', default=None,
+            help='Random seed, to compare runs on the same dataset.'),
+    )
+
+    def handle_noargs(self, **options):
+        scenarios = options['scenarios'].split(',')
+        for name in scenarios:
+            if name not in SCENARIOS:
+                raise CommandError('Unknown scenario %r' % name)
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency must be at least 1')
+        rng = random.Random(options['seed'])
+
+        report = {'dataset': dict((key, options[key]) for key in ('polls', 'choices', 'votes'))}
+        with bench.test_database():
+            started = time.time()
+            dataset = bench.seed(options['polls'], options['choices'], options['votes'], rng)
+            report['dataset']['seed_seconds'] = time.time() - started
+
+            report['scenarios'] = {}
+            for name in scenarios:
+                requests, client_class = SCENARIOS[name]
+                report['scenarios'][name] = bench.run_scenario(requests(dataset),
+                    options['requests'], options['concurrency'], client_class)
+
+        self.stdout.write(json.dumps(report, indent=2, sort_keys=True) + '\n')
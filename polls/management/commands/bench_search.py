@@ -0,0 +1,90 @@
+import json
+import random
+import string
+import time
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand, CommandError
+from django.db import router, transaction
+from django.utils import timezone
+from polls import bench
+from polls.importer import bulk_create
+from polls.models import Poll, Choice
+from polls.search import index_polls, search_available, search_polls
+
+def _word(rng):
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(7))
+
+def _grow(count, first, vocabulary, rng):
+    now = timezone.now()
+    polls = [Poll(question='%s %d?' % (' '.join(rng.sample(vocabulary, 6)), first + i),
+                  pub_date=now)
+             for i in range(count)]
+    with transaction.commit_on_success():
+        bulk_create(Poll, polls)
+        poll_ids = list(Poll.objects.filter(pk__gt=first).values_list('id', flat=True))
+        bulk_create(Choice, [Choice(poll_id=poll_id, choice=' '.join(rng.sample(vocabulary, 2)))
+                             for poll_id in poll_ids for _ in range(3)])
+        for start in range(0, len(poll_ids), 500):
+            index_polls(poll_ids[start:start + 500])
+    return first + count
+
+def _time(lookup, queries):
+    latencies = []
+    for query in queries:
+        started = time.time()
+        lookup(query)
+        latencies.append(time.time() - started)
+    return {
+        'mean_ms': sum(latencies) / len(latencies) * 1000,
+        'p95_ms': bench.percentile(latencies, 95) * 1000,
+    }
+
+class Command(NoArgsCommand):
+    help = ('Grows a throwaway database of polls and times full-text searches '
+            'against a question__icontains scan at every size, as JSON.')
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--sizes', dest='sizes', default='1000,10000,50000',
+            help='Comma separated numbers of polls to time searches at.'),
+        make_option('--lookups', dest='lookups', type='int', default=200,
+            help='Number of searches timed at each size.'),
+        make_option('--seed', dest='seed', type='int', default=None,
+            help='Random seed, to compare runs on the same dataset.'),
+    )
+
+    def handle_noargs(self, **options):
+        try:
+            sizes = sorted(int(size) for size in options['sizes'].split(','))
+        except ValueError:
+            raise CommandError('--sizes must be a comma separated list of numbers')
+        rng = random.Random(options['seed'])
+
+        report = []
+        with bench.test_database():
+            if not search_available(router.db_for_write(Poll)):
+                raise CommandError('The database has no full-text index')
+            # New polls bring new words, so that the number of polls using a
+            # word stays about the same as the table grows.
+            vocabulary, polls = [], 0
+            for size in sizes:
+                vocabulary += [_word(rng) for _ in range(max(size // 10 - len(vocabulary), 0))]
+                started = time.time()
+                polls = _grow(size - polls, polls, vocabulary, rng)
+                queries = [' '.join(rng.sample(vocabulary, rng.randint(1, 2)))
+                           for _ in range(options['lookups'])]
+
+                def scan(query):
+                    matches = Poll.objects.all()
+                    for word in query.split():
+                        matches = matches.filter(question__icontains=word)
+                    list(matches.values_list('id', 'question')[:20])
+
+                report.append({
+                    'polls': polls,
+                    'load_seconds': time.time() - started,
+                    'full_text': _time(lambda query: search_polls(query, limit=20), queries),
+                    'icontains_scan': _time(scan, queries),
+                })
+
+        self.stdout.write(json.dumps(report, indent=2, sort_keys=True) + '\n')
@@ -0,0 +1,72 @@
+import json
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from polls import bench
+from polls.db import sqlite_options
+from polls.models import Poll
+from polls.votes import record_vote
+
+# Django's stock SQLite connection: rollback journal, full syncs, default
+# page cache and the sqlite3 module's own 5 second busy timeout.
+STOCK = {
+    'JOURNAL_MODE': 'DELETE',
+    'SYNCHRONOUS': 'FULL',
+    'CACHE_SIZE_KB': None,
+    'BUSY_TIMEOUT_MS': None,
+    'PERSISTENT_CONNECTIONS': False,
+}
+
+class Command(NoArgsCommand):
+    help = ('Runs concurrent poll reads and votes against a throwaway SQLite '
+            'database, once with the stock connection setup and once with '
+            'POLLS_SQLITE, and prints latencies and lock errors as JSON.')
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--polls', dest='polls', type='int', default=20,
+            help='Number of polls to create.'),
+        make_option('--choices', dest='choices', type='int', default=5,
+            help='Number of choices per poll.'),
+        make_option('--readers', dest='readers', type='int', default=4,
+            help='Number of threads reading poll results.'),
+        make_option('--writers', dest='writers', type='int', default=4,
+            help='Number of threads voting.'),
+        make_option('--seconds', dest='seconds', type='float', default=3,
+            help='How long each configuration runs.'),
+    )
+
+    def handle_noargs(self, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('The default database is not SQLite')
+
+        report = {}
+        with bench.test_database():
+            dataset = bench.seed(options['polls'], options['choices'], 0)
+            polls = Poll.objects.in_bulk(dataset.keys())
+            poll_ids = [poll_id for poll_id in dataset if dataset[poll_id]]
+            if not poll_ids:
+                raise CommandError('--polls and --choices must be positive')
+
+            def read(rng):
+                polls[rng.choice(poll_ids)].results()
+
+            def write(rng):
+                poll_id = rng.choice(poll_ids)
+                record_vote(polls[poll_id], rng.choice(dataset[poll_id]))
+
+            for name, sqlite in (('stock', STOCK), ('configured', sqlite_options())):
+                with override_settings(POLLS_SQLITE=sqlite):
+                    # Reconnect so the journal mode is switched before the
+                    # threads open their own connections.
+                    connection.close()
+                    cursor = connection.cursor()
+                    cursor.execute('PRAGMA journal_mode')
+                    journal_mode = cursor.fetchone()[0]
+                    connection.close()
+                    report[name] = bench.run_mixed(read, write,
+                            options['readers'], options['writers'], options['seconds'])
+                    report[name]['sqlite'] = dict(sqlite, JOURNAL_MODE=journal_mode)
+
+        self.stdout.write(json.dumps(report, indent=2, sort_keys=True) + '\n')
@@ -0,0 +1,29 @@
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand, CommandError
+from django.db import connection
+from polls.export import FORMATS, export_rows
+
+class Command(NoArgsCommand):
+    help = 'Streams every poll and choice with its vote count to stdout.'
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--format', dest='format', default='csv',
+            help='Output format: csv or ndjson. Defaults to csv.'),
+        make_option('--chunk-size', dest='chunk_size', type='int', default=500,
+            help='Number of polls read from the database at a time.'),
+    )
+
+    def handle_noargs(self, **options):
+        if options['format'] not in FORMATS:
+            raise CommandError('Unknown format %r, use one of: %s' % (
+                options['format'], ', '.join(sorted(FORMATS))))
+        lines, _ = FORMATS[options['format']]
+        # With DEBUG on, every query would otherwise be kept in memory.
+        use_debug_cursor = connection.use_debug_cursor
+        connection.use_debug_cursor = False
+        try:
+            for line in lines(export_rows(options['chunk_size'])):
+                self.stdout.write(line)
+        finally:
+            connection.use_debug_cursor = use_debug_cursor
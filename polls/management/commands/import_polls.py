@@ -0,0 +1,51 @@
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+from polls.importer import PollImportError, import_polls, read_csv, read_ndjson
+
+READERS = {
+    'csv': read_csv,
+    'json': read_ndjson,
+    'ndjson': read_ndjson,
+}
+
+class Command(BaseCommand):
+    args = '<file>'
+    help = ('Imports polls and choices from a CSV file (question,pub_date,choice[,votes]) '
+            'or a newline-delimited JSON file, skipping polls that already exist.')
+
+    option_list = BaseCommand.option_list + (
+        make_option('--format', dest='format', default=None,
+            help='csv or ndjson. Guessed from the file extension by default.'),
+        make_option('--batch-size', dest='batch_size', type='int', default=250,
+            help='Number of polls inserted per transaction.'),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError('Usage: import_polls %s' % self.args)
+        path = args[0]
+        format = options['format'] or path.rsplit('.', 1)[-1].lower()
+        if format not in READERS:
+            raise CommandError('Unknown format %r, use --format csv or --format ndjson' % format)
+        verbosity = int(options.get('verbosity', 1))
+
+        started = time.time()
+        totals = [0, 0, 0]
+        try:
+            with open(path, 'rb') as lines:
+                for batch in import_polls(READERS[format](lines), options['batch_size']):
+                    totals = [total + count for total, count in zip(totals, batch)]
+                    if verbosity >= 2:
+                        self.stdout.write('%d polls, %d choices imported, %d polls skipped\n' % tuple(totals))
+        except (IOError, PollImportError), e:
+            raise CommandError('%s (%d polls imported before the error, run again to resume)' % (e, totals[0]))
+
+        if verbosity >= 1:
+            elapsed = max(time.time() - started, 1e-6)
+            self.stdout.write(
+                'Imported %d polls and %d choices in %.1fs (%.0f polls/s, %.0f choices/s), '
+                'skipped %d existing polls\n' % (
+                    totals[0], totals[1], elapsed, totals[0] / elapsed,
+                    totals[1] / elapsed, totals[2]))
@@ -0,0 +1,27 @@
+import datetime
+
+from django.core.management.base import NoArgsCommand
+from polls import cache
+from polls.buffer import published_stats
+
+class Command(NoArgsCommand):
+    help = 'Reports the results cache hit rate and the state of the vote buffers of running processes.'
+
+    def handle_noargs(self, **options):
+        results = cache.stats()
+        self.stdout.write('Results cache: %d hits, %d misses\n' % (
+            results['hits'], results['misses']))
+
+        buffers = published_stats()
+        if not buffers:
+            self.stdout.write('No vote buffer has reported to the cache\n')
+        for stats in buffers:
+            if stats['last_flush_at'] is None:
+                last_flush = 'never flushed'
+            else:
+                last_flush = 'last flush %s took %.1f ms' % (
+                        datetime.datetime.fromtimestamp(stats['last_flush_at']),
+                        stats['last_flush_latency_ms'])
+            self.stdout.write('%s:%d depth=%d flushed=%d dropped=%d, %s\n' % (
+                stats['host'], stats['pid'], stats['depth'],
+                stats['flushed_votes'], stats.get('dropped_votes', 0), last_flush))
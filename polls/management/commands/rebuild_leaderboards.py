@@ -0,0 +1,18 @@
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+from polls.leaderboard import rebuild_leaderboards
+
+class Command(NoArgsCommand):
+    help = ('Recomputes the vote totals and trending scores behind the most '
+            'voted and trending polls from the choices and the hourly vote buckets.')
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--chunk-size', dest='chunk_size', type='int', default=500,
+            help='Number of polls updated per transaction.'),
+    )
+
+    def handle_noargs(self, **options):
+        rebuilt = rebuild_leaderboards(options['chunk_size'])
+        if int(options.get('verbosity', 1)) >= 1:
+            self.stdout.write('Rebuilt the leaderboards of %d polls\n' % rebuilt)
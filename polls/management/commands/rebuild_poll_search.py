@@ -0,0 +1,22 @@
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand, CommandError
+from django.db import router
+from polls.models import Poll
+from polls.search import rebuild_index, search_available
+
+class Command(NoArgsCommand):
+    help = 'Rebuilds the full-text search index of poll questions and choices.'
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--chunk-size', dest='chunk_size', type='int', default=1000,
+            help='Number of polls indexed per transaction.'),
+    )
+
+    def handle_noargs(self, **options):
+        if not search_available(router.db_for_write(Poll)):
+            raise CommandError('The database has no polls_poll_search table. '
+                               'It needs SQLite with FTS5 and syncdb.')
+        indexed = rebuild_index(options['chunk_size'])
+        if int(options.get('verbosity', 1)) >= 1:
+            self.stdout.write('Indexed %d polls\n' % indexed)
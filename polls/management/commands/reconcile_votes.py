@@ -0,0 +1,29 @@
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+from polls.models import recount_votes
+from polls.votes import find_vote_drift
+
+class Command(NoArgsCommand):
+    help = 'Finds polls whose stored vote total drifted from their choices and fixes them.'
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--dry-run', action='store_true', dest='dry_run', default=False,
+            help='Only report drifted polls, do not fix them.'),
+    )
+
+    def handle_noargs(self, **options):
+        verbosity = int(options.get('verbosity', 1))
+        drifted = []
+        for poll_id, stored, actual in find_vote_drift():
+            if verbosity >= 2:
+                self.stdout.write('Poll %d: stored %d, actual %d\n' % (poll_id, stored, actual))
+            drifted.append(poll_id)
+
+        if not options['dry_run']:
+            for start in range(0, len(drifted), 500):
+                recount_votes(drifted[start:start + 500])
+
+        if verbosity >= 1:
+            action = 'Found' if options['dry_run'] else 'Fixed'
+            self.stdout.write('%s %d polls with a drifted vote total\n' % (action, len(drifted)))
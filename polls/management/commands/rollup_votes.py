@@ -0,0 +1,13 @@
+from django.core.management.base import NoArgsCommand
+from polls.votes import rollup_shards, rollup_events
+
+class Command(NoArgsCommand):
+    help = ('Folds votes recorded in shard rows and in the vote event log into '
+            'Choice.votes. Run it periodically.')
+
+    def handle_noargs(self, **options):
+        shards = rollup_shards()
+        events = rollup_events()
+        if int(options.get('verbosity', 1)) >= 1:
+            self.stdout.write('Rolled up %d shard votes\n' % shards)
+            self.stdout.write('Rolled up %d vote events\n' % events)
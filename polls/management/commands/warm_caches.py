@@ -0,0 +1,38 @@
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import NoArgsCommand, CommandError
+from polls.warmup import warm_caches
+
+class Command(NoArgsCommand):
+    help = ('Fills the results cache of the trending and most voted polls, and the '
+            'home page leaderboards, e.g. right after a deploy.')
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--polls', dest='polls', type='int', default=1000,
+            help='Number of polls to warm.'),
+        make_option('--batch-size', dest='batch_size', type='int', default=100,
+            help='Number of polls loaded per batch of queries.'),
+        make_option('--workers', dest='workers', type='int', default=4,
+            help='Number of batches loaded in parallel.'),
+        make_option('--budget', dest='budget', type='float', default=None,
+            help='Seconds after which no more batches are started.'),
+    )
+
+    def handle_noargs(self, **options):
+        for name in ['polls', 'batch_size', 'workers']:
+            if options[name] < 1:
+                raise CommandError('--%s must be at least 1' % name.replace('_', '-'))
+        verbosity = int(options.get('verbosity', 1))
+        backend = settings.CACHES['default']['BACKEND']
+        if backend.endswith('LocMemCache'):
+            raise CommandError('The local-memory cache is per process, so warming it from '
+                               'here would not reach the web server. Point CACHES at a '
+                               'shared cache such as memcached.')
+
+        report = warm_caches(options['polls'], options['batch_size'],
+                             options['workers'], options['budget'])
+        if verbosity >= 1:
+            self.stdout.write('Warmed %d of %d polls (%.0f%% of votes) in %.2fs\n' % (
+                report['warmed'], report['selected'],
+                report['vote_coverage'] * 100, report['seconds']))
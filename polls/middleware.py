@@ -0,0 +1,142 @@
+import cProfile
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from polls.profiling import profiles
+from polls.routers import pin_primary
+
+logger = logging.getLogger('polls.metrics')
+
+class RequestMetricsMiddleware(object):
+    """
+    Records the number of SQL queries, the time spent in SQL, the time
+    spent rendering templates and the wall time of every request.
+
+    The metrics are logged to the ``polls.metrics`` logger and, when
+    POLLS_METRICS_HEADERS is on, sent as X-Polls-* response headers.
+    Template rendering is only measured for views returning a
+    TemplateResponse. List this middleware first so that its wall time
+    covers the other middleware too.
+
+    Counting queries records every query's SQL and time, so it only
+    happens with DEBUG or POLLS_METRICS_SQL on.
+    """
+
+    def process_request(self, request):
+        request._metrics_started = time.time()
+        request._metrics_queries = None
+        if not (settings.DEBUG or getattr(settings, 'POLLS_METRICS_SQL', False)):
+            return
+        request._metrics_queries = {}
+        for connection in connections.all():
+            request._metrics_queries[connection.alias] = (
+                connection.use_debug_cursor, len(connection.queries))
+            connection.use_debug_cursor = True
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_view = '%s.%s' % (view_func.__module__, view_func.__name__)
+
+    def process_template_response(self, request, response):
+        started = time.time()
+        def rendered(response):
+            request._metrics_render_time = time.time() - started
+        response.add_post_render_callback(rendered)
+        return response
+
+    def process_response(self, request, response):
+        if not hasattr(request, '_metrics_started'):
+            return response
+
+        metrics = {
+            'view': getattr(request, '_metrics_view', None),
+            'status': response.status_code,
+            'queries': None,
+            'sql_ms': None,
+            'render_ms': getattr(request, '_metrics_render_time', 0.0) * 1000,
+            'total_ms': (time.time() - request._metrics_started) * 1000,
+        }
+        message = 'view=%(view)s status=%(status)d '
+        if request._metrics_queries is not None:
+            queries, sql_time = 0, 0.0
+            for connection in connections.all():
+                use_debug_cursor, start = request._metrics_queries.get(
+                        connection.alias, (connection.use_debug_cursor, 0))
+                executed = connection.queries[start:]
+                queries += len(executed)
+                sql_time += sum(float(query['time']) for query in executed)
+                connection.use_debug_cursor = use_debug_cursor
+            metrics.update(queries=queries, sql_ms=sql_time * 1000)
+            message += 'queries=%(queries)d sql_ms=%(sql_ms).1f '
+        message += 'render_ms=%(render_ms).1f total_ms=%(total_ms).1f'
+        logger.info(message % metrics, extra={'metrics': metrics})
+
+        if getattr(settings, 'POLLS_METRICS_HEADERS', False):
+            if metrics['queries'] is not None:
+                response['X-Polls-Queries'] = str(metrics['queries'])
+                response['X-Polls-SQL-Time-Ms'] = '%.1f' % metrics['sql_ms']
+            response['X-Polls-Render-Time-Ms'] = '%.1f' % metrics['render_ms']
+            response['X-Polls-Time-Ms'] = '%.1f' % metrics['total_ms']
+        return response
+
+class PinPrimaryMiddleware(object):
+    """
+    Sends all reads of a request to the primary database when the request
+    writes, or when the same client wrote within the last
+    POLLS_PIN_PRIMARY_SECONDS, so that voters see their own votes however
+    far the replicas lag behind.
+    """
+
+    def process_request(self, request):
+        pin_primary(request.method not in ('GET', 'HEAD', 'OPTIONS')
+                    or settings.POLLS_PIN_PRIMARY_COOKIE in request.COOKIES)
+
+    def process_response(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400:
+            response.set_cookie(settings.POLLS_PIN_PRIMARY_COOKIE, '1',
+                    max_age=settings.POLLS_PIN_PRIMARY_SECONDS, httponly=True)
+        pin_primary(False)
+        return response
+
+class ProfilingMiddleware(object):
+    """
+    Runs a POLLS_PROFILING['SAMPLE_RATE'] fraction of requests, and the
+    requests of staff members sending the POLLS_PROFILING['HEADER']
+    header, under cProfile. The profile covers the view, template
+    rendering and the middleware listed after this one, and is merged into
+    the stats of its view in polls.profiling.profiles.
+
+    List it after AuthenticationMiddleware. Requests that are not sampled
+    only cost a header lookup.
+    """
+
+    def __init__(self):
+        options = getattr(settings, 'POLLS_PROFILING', {})
+        if not options.get('ENABLED', False):
+            raise MiddlewareNotUsed
+        self.sample_rate = options.get('SAMPLE_RATE', 0)
+        header = options.get('HEADER')
+        self.header = header and 'HTTP_' + header.upper().replace('-', '_')
+
+    def sampled(self, request):
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        return bool(self.header and self.header in request.META
+                    and request.user.is_staff)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self.sampled(request):
+            request._profiler = cProfile.Profile()
+            request._profiler_view = '%s.%s' % (view_func.__module__, view_func.__name__)
+            request._profiler.enable()
+
+    def process_response(self, request, response):
+        profiler = getattr(request, '_profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            del request._profiler
+            profiles.add(request._profiler_view, profiler)
+        return response
@@ -1,22 +1,303 @@
-from django.db import models
+import datetime
+from collections import namedtuple
+from django.db import connections, models, router, transaction, DatabaseError
+from django.db.models import Count, Q, Sum
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from polls.cache import bump_results_version, bump_home_version
+from polls import db
+from polls.routers import use_primary
+
+PollResults = namedtuple('PollResults', ['total_votes', 'choices'])
+ChoiceResult = namedtuple('ChoiceResult', ['id', 'choice', 'votes', 'percentage'])
+
+def build_results(rows, pending=None):
+    pending = pending or {}
+    rows = [(choice_id, choice, votes + pending.get(choice_id, 0))
+            for choice_id, choice, votes in rows]
+    total = sum(votes for _, _, votes in rows)
+    choices = []
+    for choice_id, choice, votes in rows:
+        try:
+            percentage = 100.0 * votes / total
+        except ZeroDivisionError:
+            percentage = 0
+        choices.append(ChoiceResult(choice_id, choice, votes, percentage))
+    return PollResults(total, choices)
+
+def pending_votes(polls):
+    """
+    Votes recorded for the given (poll_id, vote_mode) polls that have not
+    been rolled up into Choice.votes yet, as a {choice_id: votes} dict.
+    """
+    polls = list(polls)
+    sharded = [poll_id for poll_id, mode in polls if mode == Poll.SHARDED_VOTES]
+    logged = [poll_id for poll_id, mode in polls if mode == Poll.EVENT_VOTES]
+    pending = {}
+    if sharded:
+        pending.update(VoteShard.objects.filter(choice__poll__in=sharded)
+                .values_list('choice').annotate(Sum('votes')))
+    if logged:
+        pending.update(VoteEvent.objects.unrolled().filter(poll__in=logged)
+                .values_list('choice').annotate(Count('id')))
+    return pending
+
+def results_for_polls(poll_ids):
+    """
+    Returns {poll_id: (question, PollResults)} for the existing polls among
+    ``poll_ids``, using a fixed number of queries.
+    """
+    polls = Poll.objects.filter(pk__in=poll_ids) \
+            .values_list('id', 'question', 'vote_mode')
+    questions, modes = {}, []
+    for poll_id, question, vote_mode in polls:
+        questions[poll_id] = question
+        modes.append((poll_id, vote_mode))
+    if not questions:
+        return {}
+
+    rows = dict((poll_id, []) for poll_id in questions)
+    choices = Choice.objects.filter(poll__in=questions.keys()).order_by('id') \
+            .values_list('poll', 'id', 'choice', 'votes')
+    for poll_id, choice_id, choice, votes in choices:
+        rows[poll_id].append((choice_id, choice, votes))
+
+    pending = pending_votes(modes)
+    return dict((poll_id, (questions[poll_id], build_results(rows[poll_id], pending)))
+                for poll_id in questions)
+
+def recount_votes(poll_ids, using=None):
+    """
+    Recomputes the stored Poll.votes totals of the given polls from their
+    choices' votes with a single UPDATE.
+    """
+    using = using or router.db_for_write(Poll)
+    poll_ids = list(poll_ids)
+    if not poll_ids:
+        return
+    cursor = connections[using].cursor()
+    cursor.execute(
+        'UPDATE %(poll)s SET votes = ('
+        '  SELECT COALESCE(SUM(votes), 0) FROM %(choice)s'
+        '  WHERE %(choice)s.poll_id = %(poll)s.id'
+        ') WHERE id IN (%(ids)s)' % {
+            'poll': Poll._meta.db_table,
+            'choice': Choice._meta.db_table,
+            'ids': ', '.join(['%s'] * len(poll_ids)),
+        }, poll_ids)
+    transaction.commit_unless_managed(using=using)
 
 class Poll(models.Model):
+    DIRECT_VOTES = 'direct'
+    SHARDED_VOTES = 'sharded'
+    EVENT_VOTES = 'events'
+    VOTE_MODES = (
+        (DIRECT_VOTES, 'Direct'),
+        (SHARDED_VOTES, 'Sharded counters'),
+        (EVENT_VOTES, 'Event log'),
+    )
+
     question = models.CharField(max_length=200)
     pub_date = models.DateTimeField(verbose_name='Date published')
+    vote_mode = models.CharField(max_length=10, choices=VOTE_MODES,
+            default=DIRECT_VOTES)
+    votes = models.IntegerField(default=0, editable=False, db_index=True)
+    # See polls.leaderboard.trending_score().
+    trending = models.FloatField(null=True, editable=False, db_index=True)
+
+    # Only ever changed by UPDATEs that add to them, see polls.votes.
+    COUNTER_FIELDS = ('votes', 'trending')
 
     def __unicode__(self):
         return self.question
 
+    def save(self, force_insert=False, force_update=False, using=None):
+        """
+        Saves an existing poll without its COUNTER_FIELDS, so that saving a
+        poll loaded before a vote (e.g. from the admin) cannot undo it.
+        """
+        using = using or router.db_for_write(Poll, instance=self)
+        if self.pk is None or force_insert:
+            return super(Poll, self).save(force_insert, force_update, using)
+
+        pre_save.send(sender=Poll, instance=self, raw=False, using=using)
+        fields = dict((f.attname, f.pre_save(self, False)) for f in self._meta.local_fields
+                      if not f.primary_key and f.attname not in self.COUNTER_FIELDS)
+        if not Poll.objects.using(using).filter(pk=self.pk).update(**fields):
+            if force_update:
+                raise DatabaseError('Forced update did not affect any rows.')
+            return super(Poll, self).save(force_insert=True, using=using)
+        self._state.db = using
+        self._state.adding = False
+        post_save.send(sender=Poll, instance=self, created=False, raw=False, using=using)
+
+    def pending_votes(self):
+        """
+        Votes recorded for this poll that have not been rolled up into
+        Choice.votes yet, as a {choice_id: votes} dict.
+        """
+        if self.vote_mode == self.DIRECT_VOTES:
+            return {}
+        return pending_votes([(self.pk, self.vote_mode)])
+
     def total_votes(self):
-        return sum(c.votes for c in self.choice_set.all())
+        return self.votes + sum(self.pending_votes().values())
+
+    def recount_votes(self):
+        using = router.db_for_write(Poll, instance=self)
+        recount_votes([self.pk], using=using)
+        self.votes = Poll.objects.using(using).filter(pk=self.pk) \
+                .values_list('votes', flat=True)[0]
+
+    def results(self):
+        rows = self.choice_set.order_by('id').values_list('id', 'choice', 'votes')
+        return build_results(rows, self.pending_votes())
 
 class Choice(models.Model):
     poll = models.ForeignKey(Poll)
     choice = models.CharField(max_length=200)
     votes = models.IntegerField(default=0)
 
+    def save(self, *args, **kwargs):
+        super(Choice, self).save(*args, **kwargs)
+        with use_primary():
+            self.poll.recount_votes()
+
+    def delete(self, *args, **kwargs):
+        super(Choice, self).delete(*args, **kwargs)
+        with use_primary():
+            self.poll.recount_votes()
+
+    def vote_count(self):
+        if self.poll.vote_mode == Poll.SHARDED_VOTES:
+            pending = self.shards.aggregate(pending=Sum('votes'))['pending']
+            return self.votes + (pending or 0)
+        if self.poll.vote_mode == Poll.EVENT_VOTES:
+            return self.votes + VoteEvent.objects.unrolled().filter(choice=self).count()
+        return self.votes
+
     def percentage(self):
         try:
-            return 100.0 * self.votes / self.poll.total_votes()
+            return 100.0 * self.vote_count() / self.poll.total_votes()
         except ZeroDivisionError:
             return 0
+
+class VoteShard(models.Model):
+    choice = models.ForeignKey(Choice, related_name='shards')
+    shard = models.PositiveSmallIntegerField()
+    votes = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('choice', 'shard')
+
+class VoteBucket(models.Model):
+    """
+    Votes a choice received during one minute, hour or (UTC) day.
+    """
+    MINUTE = 'minute'
+    HOUR = 'hour'
+    DAY = 'day'
+    RESOLUTIONS = (
+        (MINUTE, 'Minute'),
+        (HOUR, 'Hour'),
+        (DAY, 'Day'),
+    )
+    STEPS = {
+        MINUTE: datetime.timedelta(minutes=1),
+        HOUR: datetime.timedelta(hours=1),
+        DAY: datetime.timedelta(days=1),
+    }
+
+    choice = models.ForeignKey(Choice, related_name='buckets')
+    resolution = models.CharField(max_length=6, choices=RESOLUTIONS)
+    start = models.DateTimeField()
+    votes = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('choice', 'resolution', 'start')
+
+    @classmethod
+    def floor(cls, resolution, when):
+        """
+        Returns the start of the ``resolution`` bucket that ``when`` falls in.
+        """
+        when = when.astimezone(timezone.utc).replace(second=0, microsecond=0)
+        if resolution in (cls.HOUR, cls.DAY):
+            when = when.replace(minute=0)
+        if resolution == cls.DAY:
+            when = when.replace(hour=0)
+        return when
+
+def votes_before(choice_ids, when):
+    """
+    Returns {choice_id: votes} counted in the vote buckets of the given
+    choices before ``when``, a minute boundary. Whole days are read from day
+    buckets and the rest from hour and minute buckets, so at most a day's
+    worth of finer buckets is summed.
+    """
+    day = VoteBucket.floor(VoteBucket.DAY, when)
+    hour = VoteBucket.floor(VoteBucket.HOUR, when)
+    buckets = VoteBucket.objects.filter(choice__in=choice_ids).filter(
+            Q(resolution=VoteBucket.DAY, start__lt=day) |
+            Q(resolution=VoteBucket.HOUR, start__gte=day, start__lt=hour) |
+            Q(resolution=VoteBucket.MINUTE, start__gte=hour, start__lt=when))
+    return dict(buckets.values_list('choice').annotate(Sum('votes')))
+
+class RollupMark(models.Model):
+    """
+    High-water mark of a rollup job: the id of the last row it folded in.
+    """
+    VOTE_EVENTS = 'vote-events'
+
+    name = models.CharField(max_length=50, unique=True)
+    last_id = models.IntegerField(default=0)
+
+class VoteEventManager(models.Manager):
+
+    def unrolled_condition(self):
+        return ('%(event)s.id > COALESCE((SELECT last_id FROM %(mark)s WHERE name = %%s), 0)' % {
+            'event': VoteEvent._meta.db_table,
+            'mark': RollupMark._meta.db_table,
+        }, [RollupMark.VOTE_EVENTS])
+
+    def unrolled(self):
+        """
+        Events that the rollup has not folded into Choice.votes yet.
+        """
+        condition, params = self.unrolled_condition()
+        return self.extra(where=[condition], params=params)
+
+class VoteEvent(models.Model):
+    """
+    One vote on a poll using the event log. Rows are only ever inserted,
+    and the poll is stored too so that a poll's unrolled tail can be read
+    without a join.
+    """
+    poll = models.ForeignKey(Poll)
+    choice = models.ForeignKey(Choice)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    objects = VoteEventManager()
+
+@receiver(post_save, sender=Poll)
+@receiver(post_delete, sender=Poll)
+def invalidate_poll_results(sender, instance, **kwargs):
+    bump_results_version(instance.pk)
+    bump_home_version()
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def invalidate_choice_results(sender, instance, **kwargs):
+    bump_results_version(instance.poll_id)
+
+@receiver(post_save, sender=Poll)
+@receiver(post_delete, sender=Poll)
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def update_search_index(sender, instance, using, **kwargs):
+    from polls.search import index_polls
+    poll_id = instance.pk if sender is Poll else instance.poll_id
+    index_polls([poll_id], using=using)
+
+db.install()
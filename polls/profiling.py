@@ -0,0 +1,74 @@
+import marshal
+import pstats
+import threading
+from collections import OrderedDict
+from StringIO import StringIO
+
+from django.conf import settings
+
+class ProfileStore(object):
+    """
+    Merges the cProfile profiles of sampled requests into one pstats.Stats
+    per view, for up to ``max_views`` views. The view profiled the longest
+    time ago is dropped to make room for a new one.
+    """
+
+    def __init__(self, max_views=100):
+        self.max_views = max_views
+        self._stats = OrderedDict()
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        options = getattr(settings, 'POLLS_PROFILING', {})
+        return cls(max_views=options.get('MAX_VIEWS', 100))
+
+    def add(self, view, profiler):
+        stats = pstats.Stats(profiler)
+        with self._lock:
+            if view in self._stats:
+                stats = self._stats.pop(view).add(stats)
+            elif len(self._stats) >= self.max_views:
+                dropped, _ = self._stats.popitem(last=False)
+                del self._samples[dropped]
+            self._stats[view] = stats
+            self._samples[view] = self._samples.get(view, 0) + 1
+
+    def views(self):
+        """
+        Returns [(view, samples)], most recently profiled first.
+        """
+        with self._lock:
+            return [(view, self._samples[view]) for view in reversed(self._stats)]
+
+    def dump(self, view):
+        """
+        Returns a view's stats in the format of pstats.Stats.dump_stats(),
+        which pstats, snakeviz and the like can load, or None.
+        """
+        with self._lock:
+            if view not in self._stats:
+                return None
+            return marshal.dumps(self._stats[view].stats)
+
+    def report(self, view, limit=30, sort='cumulative'):
+        """
+        Returns the ``limit`` functions of a view taking the most time, as
+        printed by pstats, or None.
+        """
+        output = StringIO()
+        with self._lock:
+            if view not in self._stats:
+                return None
+            stats = self._stats[view]
+            stats.stream = output
+            stats.sort_stats(sort).print_stats(limit)
+        return output.getvalue()
+
+    def clear(self):
+        with self._lock:
+            self._stats.clear()
+            self._samples.clear()
+
+profiles = ProfileStore.from_settings()
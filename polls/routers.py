@@ -0,0 +1,52 @@
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+_state = threading.local()
+
+def pinned():
+    return getattr(_state, 'pinned', False)
+
+def pin_primary(value=True):
+    _state.pinned = value
+
+@contextmanager
+def use_primary():
+    """
+    Sends the block's reads to the primary, e.g. to fill a cache that must
+    not hold data from a replica that is lagging behind.
+    """
+    previous = pinned()
+    pin_primary()
+    try:
+        yield
+    finally:
+        pin_primary(previous)
+
+class PrimaryReplicaRouter(object):
+    """
+    Sends reads of polls models to one of the POLLS_DATABASE_REPLICAS, and
+    writes and pinned reads to the default database.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != 'polls':
+            return None
+        replicas = getattr(settings, 'POLLS_DATABASE_REPLICAS', ())
+        if not replicas or pinned():
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label != 'polls':
+            return None
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        if obj1._meta.app_label == 'polls' or obj2._meta.app_label == 'polls':
+            return True
+        return None
@@ -0,0 +1,126 @@
+from django.db import connections, router, transaction, DatabaseError
+from polls.models import Poll, Choice
+
+SEARCH_TABLE = 'polls_poll_search'
+
+# bm25() weights of the question and choices columns.
+QUESTION_WEIGHT = 2.0
+CHOICES_WEIGHT = 1.0
+
+_available = set()
+
+def create_search_table(using):
+    """
+    Creates the full-text index of each poll's question and choices, keyed
+    by poll id, and returns whether it exists. Only SQLite builds with FTS5
+    have one. This is not part of sql/poll.sqlite3.sql, as syncdb runs a
+    model's custom SQL in one transaction that a missing FTS5 would roll
+    back.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    try:
+        connection.cursor().execute('CREATE VIRTUAL TABLE IF NOT EXISTS %s '
+                                    'USING fts5(question, choices)' % SEARCH_TABLE)
+    except DatabaseError:
+        transaction.rollback_unless_managed(using=using)
+        return False
+    transaction.commit_unless_managed(using=using)
+    return True
+
+def search_available(using):
+    """
+    Whether the full-text index exists on the ``using`` database (see
+    create_search_table()).
+    """
+    if using in _available:
+        return True
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    if SEARCH_TABLE in connection.introspection.table_names():
+        _available.add(using)
+        return True
+    return False
+
+def index_polls(poll_ids, using=None):
+    """
+    Replaces the index entries of the given polls with their current
+    question and choices, dropping those of polls that no longer exist.
+    """
+    using = using or router.db_for_write(Poll)
+    poll_ids = list(poll_ids)
+    if not poll_ids or not search_available(using):
+        return
+    cursor = connections[using].cursor()
+    placeholders = ', '.join(['%s'] * len(poll_ids))
+    cursor.execute('DELETE FROM %s WHERE rowid IN (%s)' % (SEARCH_TABLE, placeholders),
+            poll_ids)
+    cursor.execute(
+        'INSERT INTO %(search)s (rowid, question, choices)'
+        ' SELECT p.id, p.question, COALESCE(GROUP_CONCAT(c.choice, \' \'), \'\')'
+        ' FROM %(poll)s p LEFT OUTER JOIN %(choice)s c ON c.poll_id = p.id'
+        ' WHERE p.id IN (%(ids)s) GROUP BY p.id' % {
+            'search': SEARCH_TABLE,
+            'poll': Poll._meta.db_table,
+            'choice': Choice._meta.db_table,
+            'ids': placeholders,
+        }, poll_ids)
+    transaction.commit_unless_managed(using=using)
+
+def rebuild_index(chunk_size=1000, using=None):
+    """
+    Indexes every poll again, ``chunk_size`` polls per transaction, and
+    returns the number of polls indexed.
+    """
+    using = using or router.db_for_write(Poll)
+    if not search_available(using):
+        return 0
+    with transaction.commit_on_success(using=using):
+        connections[using].cursor().execute('DELETE FROM %s' % SEARCH_TABLE)
+    last_id, indexed = 0, 0
+    while True:
+        poll_ids = list(Poll.objects.using(using).filter(pk__gt=last_id).order_by('pk')
+                .values_list('id', flat=True)[:chunk_size])
+        if not poll_ids:
+            return indexed
+        with transaction.commit_on_success(using=using):
+            index_polls(poll_ids, using=using)
+        last_id = poll_ids[-1]
+        indexed += len(poll_ids)
+
+def _match_expression(query):
+    # Every word must match; the last one may be a prefix, so that results
+    # show up while the user is still typing it.
+    words = ['"%s"' % word.replace('"', '""') for word in query.split()]
+    if words:
+        words[-1] += '*'
+    return ' '.join(words)
+
+def search_polls(query, offset=0, limit=20):
+    """
+    Returns [(poll_id, question)] for the polls whose question or choices
+    contain every word of ``query``, best matches first.
+
+    Without the full-text index, e.g. on other databases than SQLite, this
+    falls back to a case-insensitive substring match on questions, in
+    primary key order.
+    """
+    using = router.db_for_read(Poll)
+    expression = _match_expression(query)
+    if not expression:
+        return []
+    if not search_available(using):
+        polls = Poll.objects.using(using)
+        for word in query.split():
+            polls = polls.filter(question__icontains=word)
+        return list(polls.order_by('pk').values_list('id', 'question')[offset:offset + limit])
+
+    cursor = connections[using].cursor()
+    cursor.execute(
+        'SELECT rowid, question FROM %s WHERE %s MATCH %%s'
+        ' ORDER BY bm25(%s, %s, %s) LIMIT %%s OFFSET %%s' % (
+            SEARCH_TABLE, SEARCH_TABLE, SEARCH_TABLE, QUESTION_WEIGHT, CHOICES_WEIGHT),
+        [expression, limit, offset])
+    return cursor.fetchall()
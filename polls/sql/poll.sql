@@ -0,0 +1,2 @@
+-- Backs the keyset pagination of the home page.
+CREATE INDEX polls_poll_pub_date_id ON polls_poll (pub_date, id);
@@ -0,0 +1,3 @@
+-- Backs the admin's case-insensitive prefix search on question, which
+-- polls/admin.py runs as a NOCASE range of this index.
+CREATE INDEX polls_poll_question_nocase ON polls_poll (question COLLATE NOCASE);
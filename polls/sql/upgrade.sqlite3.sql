@@ -0,0 +1,18 @@
+-- Brings a database created before polls stored vote totals, vote modes
+-- and trending scores up to the current schema. syncdb creates the new
+-- tables and the search table but never alters polls_poll, nor runs the
+-- custom SQL of a table that already exists. See README.md for the steps.
+BEGIN;
+ALTER TABLE polls_poll ADD COLUMN vote_mode varchar(10) NOT NULL DEFAULT 'direct';
+ALTER TABLE polls_poll ADD COLUMN votes integer NOT NULL DEFAULT 0;
+ALTER TABLE polls_poll ADD COLUMN trending real;
+CREATE INDEX polls_poll_da122a89 ON polls_poll (votes);
+CREATE INDEX polls_poll_560da84c ON polls_poll (trending);
+CREATE INDEX polls_poll_pub_date_id ON polls_poll (pub_date, id);
+CREATE INDEX polls_poll_question_nocase ON polls_poll (question COLLATE NOCASE);
+-- The totals reconcile_votes and the most voted leaderboard start from.
+UPDATE polls_poll SET votes = (
+    SELECT COALESCE(SUM(votes), 0) FROM polls_choice
+    WHERE polls_choice.poll_id = polls_poll.id
+);
+COMMIT;
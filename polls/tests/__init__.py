@@ -1,3 +1,21 @@
 from polls.tests.test_models import *
 from polls.tests.test_views import *
 from polls.tests.test_forms import *
+from polls.tests.test_votes import *
+from polls.tests.test_buffer import *
+from polls.tests.test_cache import *
+from polls.tests.test_conditional import *
+from polls.tests.test_api import *
+from polls.tests.test_export import *
+from polls.tests.test_importer import *
+from polls.tests.test_middleware import *
+from polls.tests.test_bench import *
+from polls.tests.test_db import *
+from polls.tests.test_routers import *
+from polls.tests.test_admin import *
+from polls.tests.test_wsgi import *
+from polls.tests.test_search import *
+from polls.tests.test_leaderboard import *
+from polls.tests.test_profiling import *
+from polls.tests.test_warmup import *
+from polls.tests.test_upgrade import *
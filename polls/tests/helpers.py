@@ -0,0 +1,37 @@
+from django.core.signals import request_started
+from django.db import connection, reset_queries
+
+class _AssertMaxQueriesContext(object):
+    def __init__(self, test_case, budget):
+        self.test_case = test_case
+        self.budget = budget
+
+    def __enter__(self):
+        self.old_debug_cursor = connection.use_debug_cursor
+        connection.use_debug_cursor = True
+        self.starting_queries = len(connection.queries)
+        request_started.disconnect(reset_queries)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        connection.use_debug_cursor = self.old_debug_cursor
+        request_started.connect(reset_queries)
+        if exc_type is not None:
+            return
+
+        executed = connection.queries[self.starting_queries:]
+        self.test_case.assertTrue(len(executed) <= self.budget,
+            '%d queries executed, the budget is %d:\n%s' % (
+                len(executed), self.budget,
+                '\n'.join(query['sql'] for query in executed)))
+
+class QueryBudgetMixin(object):
+    """
+    Lets tests assert that a block of code stays within a query budget:
+
+        with self.assertMaxQueries(2):
+            self.client.get('/')
+    """
+
+    def assertMaxQueries(self, budget):
+        return _AssertMaxQueriesContext(self, budget)
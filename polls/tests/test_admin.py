@@ -0,0 +1,72 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from polls.admin import question_prefix
+from polls.models import Poll, Choice
+from polls.votes import record_vote
+
+class PollAdminTest(TestCase):
+
+    def setUp(self):
+        User.objects.create_superuser('admin', 'admin@example.com', 'adm1n')
+        self.client.login(username='admin', password='adm1n')
+        for i, mode in enumerate([Poll.DIRECT_VOTES, Poll.SHARDED_VOTES, Poll.EVENT_VOTES] * 5):
+            poll = Poll(question='question %d' % i, pub_date=timezone.now(), vote_mode=mode)
+            poll.save()
+            choice = Choice(poll=poll, choice='42', votes=i)
+            choice.save()
+            record_vote(poll, choice.id, count=2)
+
+    def test_changelist_shows_total_votes_from_one_query(self):
+        with self.assertNumQueries(7):
+            response = self.client.get('/admin/polls/poll/')
+
+        self.assertEquals(response.status_code, 200)
+        changelist = response.context['cl']
+        polls = sorted(changelist.result_list, key=lambda poll: poll.id)
+        self.assertEquals([changelist.model_admin.total_votes(poll) for poll in polls],
+                          [i + 2 for i in range(15)])
+
+    def test_changelist_searches_question_prefixes(self):
+        Poll(question='Answer', pub_date=timezone.now()).save()
+
+        response = self.client.get('/admin/polls/poll/', {'q': 'ANSW'})
+
+        questions = [poll.question for poll in response.context['cl'].result_list]
+        self.assertEquals(questions, ['Answer'])
+        self.assertEquals(self.client.get('/admin/polls/poll/', {'q': 'estion'})
+                .context['cl'].result_count, 0)
+        self.assertEquals(self.client.get('/admin/polls/poll/', {'q': 'Question 1'})
+                .context['cl'].result_count, 6)
+
+    def test_prefix_search_matches_like_istartswith(self):
+        for question in [u'Zebra', u'zeta', u'Z', u'Zz', u'za\u00e9', u'[bracket', u'Y',
+                         u'x@1', u'x[', u'x_', u'xA']:
+            Poll(question=question, pub_date=timezone.now()).save()
+
+        for prefix in [u'z', u'ZE', u'Za\u00e9', u'[', u'y', u'question 1', u'x@', u'X']:
+            self.assertEquals(
+                sorted(question_prefix(Poll.objects.all(), prefix).values_list('id', flat=True)),
+                sorted(Poll.objects.filter(question__istartswith=prefix).values_list('id', flat=True)))
+
+    def test_unfiltered_counts_use_the_estimate_on_large_tables(self):
+        with self.settings(POLLS_ADMIN_ESTIMATED_COUNT_ABOVE=10):
+            Poll.objects.filter(question='question 0').delete()
+            changelist = self.client.get('/admin/polls/poll/').context['cl']
+            self.assertEquals(changelist.result_count, 15)
+
+            changelist = self.client.get('/admin/polls/poll/', {'q': 'question'}).context['cl']
+            self.assertEquals(changelist.result_count, 14)
+
+class PollAdminIndexTest(TestCase):
+
+    # Kept away from test data: the sqlite3 module commits before running
+    # an EXPLAIN.
+    def test_prefix_search_is_read_from_the_question_index(self):
+        sql, params = question_prefix(Poll.objects.all(), u'Ans').query.sql_with_params()
+        cursor = connection.cursor()
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('polls_poll_question_nocase', plan)
+        self.assertNotIn('SCAN', plan)
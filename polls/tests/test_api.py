@@ -0,0 +1,186 @@
+import datetime
+import json
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from polls.models import Poll, Choice
+from mock import patch
+from polls.cache import results_version
+from polls.votes import record_vote
+
+class ResultsApiTest(TestCase):
+
+    def create_poll(self, question, votes, **kwargs):
+        poll = Poll(question=question, pub_date=timezone.now(), **kwargs)
+        poll.save()
+        for i, count in enumerate(votes):
+            Choice(poll=poll, choice='choice %d' % i, votes=count).save()
+        return poll
+
+    def test_api_returns_results_of_one_poll(self):
+        poll = self.create_poll('6 times 7', [1, 3])
+
+        response = self.client.get('/api/poll/%d/' % (poll.id,))
+
+        self.assertEquals(response['Content-Type'], 'application/json')
+        data = json.loads(response.content)
+        self.assertEquals(data['question'], '6 times 7')
+        self.assertEquals(data['total_votes'], 4)
+        self.assertEquals([(c['choice'], c['votes'], c['percentage']) for c in data['choices']], [
+            ('choice 0', 1, 25),
+            ('choice 1', 3, 75),
+        ])
+
+    def test_api_answers_404_for_unknown_polls(self):
+        response = self.client.get('/api/poll/42/')
+
+        self.assertEquals(response.status_code, 404)
+
+    def test_bulk_api_uses_a_fixed_number_of_queries(self):
+        polls = [self.create_poll('poll %d' % i, [i, 1, 2]) for i in range(10)]
+        ids = ','.join(str(p.id) for p in reversed(polls))
+
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/polls/', {'ids': ids + ',999'})
+
+        data = json.loads(response.content)
+        self.assertEquals([p['id'] for p in data['polls']], [p.id for p in reversed(polls)])
+        self.assertEquals(data['polls'][-1]['total_votes'], 3)
+
+    def test_bulk_api_includes_votes_that_are_not_rolled_up(self):
+        poll = self.create_poll('sharded', [1, 0], vote_mode=Poll.SHARDED_VOTES)
+        record_vote(poll, poll.choice_set.all()[1].id, count=3)
+
+        response = self.client.get('/api/polls/', {'ids': str(poll.id)})
+
+        [data] = json.loads(response.content)['polls']
+        self.assertEquals(data['total_votes'], 4)
+        self.assertEquals([c['votes'] for c in data['choices']], [1, 3])
+
+    def test_bulk_api_rejects_bad_ids(self):
+        self.assertEquals(self.client.get('/api/polls/', {'ids': '1,x'}).status_code, 400)
+
+        with self.settings(POLLS_API_MAX_IDS=2):
+            response = self.client.get('/api/polls/', {'ids': '1,2,3'})
+        self.assertEquals(response.status_code, 400)
+
+class LiveResultsApiTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.poll = Poll(question='6 times 7', pub_date=timezone.now())
+        self.poll.save()
+        self.choices = []
+        for i in range(3):
+            choice = Choice(poll=self.poll, choice='choice %d' % i, votes=i)
+            choice.save()
+            self.choices.append(choice)
+        self.url = '/api/poll/%d/changes/' % (self.poll.id,)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_first_request_returns_all_results_and_their_version(self):
+        data = json.loads(self.client.get(self.url).content)
+
+        self.assertEquals(data['version'], results_version(self.poll.id))
+        self.assertEquals(data['total_votes'], 3)
+        self.assertEquals([c['votes'] for c in data['choices']], [0, 1, 2])
+
+    @patch('polls.views.time.sleep')
+    def test_times_out_empty_without_querying(self, sleep):
+        version = json.loads(self.client.get(self.url).content)['version']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {'version': version, 'timeout': 1})
+
+        self.assertEquals(response.status_code, 204)
+        self.assertEquals(sleep.call_count, 4)
+
+    @patch('polls.views.time.sleep')
+    def test_returns_only_changed_counts_when_a_vote_lands(self, sleep):
+        version = json.loads(self.client.get(self.url).content)['version']
+        sleep.side_effect = lambda seconds: record_vote(self.poll, self.choices[1].id) \
+                if sleep.call_count == 2 else None
+
+        response = self.client.get(self.url, {'version': version})
+
+        data = json.loads(response.content)
+        self.assertEquals(sleep.call_count, 2)
+        self.assertEquals(data['version'], results_version(self.poll.id))
+        self.assertEquals(data['total_votes'], 4)
+        self.assertEquals([(c['id'], c['votes']) for c in data['choices']],
+                          [(self.choices[1].id, 2)])
+
+    def test_rejects_bad_versions(self):
+        response = self.client.get(self.url, {'version': 'abc'})
+
+        self.assertEquals(response.status_code, 400)
+
+    def test_rejects_timeouts_that_are_not_finite(self):
+        for timeout in ['nan', '-inf']:
+            response = self.client.get(self.url, {'version': '1', 'timeout': timeout})
+            self.assertEquals(response.status_code, 400)
+
+class VoteHistoryApiTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.poll = Poll(question='6 times 7', pub_date=timezone.now())
+        self.poll.save()
+        self.choice1 = Choice(poll=self.poll, choice='42', votes=0)
+        self.choice1.save()
+        self.choice2 = Choice(poll=self.poll, choice='The ultimate answer', votes=0)
+        self.choice2.save()
+        self.url = '/api/poll/%d/history/' % (self.poll.id,)
+
+    def tearDown(self):
+        cache.clear()
+
+    def vote_at(self, when, choice, count=1):
+        with patch('polls.votes.timezone.now', return_value=when):
+            record_vote(self.poll, choice.id, count)
+
+    def test_history_returns_votes_and_percentages_per_bucket(self):
+        base = datetime.datetime(2013, 5, 1, 9, 0, tzinfo=timezone.utc)
+        self.vote_at(base - datetime.timedelta(days=2), self.choice1, 2)
+        self.vote_at(base + datetime.timedelta(minutes=30), self.choice2, 2)
+        self.vote_at(base + datetime.timedelta(hours=1, minutes=5), self.choice1)
+        self.vote_at(base + datetime.timedelta(hours=1, minutes=59), self.choice2, 3)
+
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url, {'resolution': 'hour',
+                    'since': '2013-05-01T09:15:00Z', 'until': '2013-05-01T12:00:00Z'})
+
+        data = json.loads(response.content)
+        self.assertEquals(data['resolution'], 'hour')
+        self.assertEquals([c['id'] for c in data['choices']], [self.choice1.id, self.choice2.id])
+        self.assertEquals([point['start'] for point in data['series']],
+                ['2013-05-01T09:00:00+00:00', '2013-05-01T10:00:00+00:00',
+                 '2013-05-01T11:00:00+00:00'])
+        self.assertEquals([point['votes'] for point in data['series']],
+                [[0, 2], [1, 3], [0, 0]])
+        self.assertEquals([point['percentages'] for point in data['series']],
+                [[50, 50], [37.5, 62.5], [37.5, 62.5]])
+
+    def test_history_counts_earlier_votes_from_the_coarsest_buckets(self):
+        base = datetime.datetime(2013, 5, 1, 9, 30, tzinfo=timezone.utc)
+        self.vote_at(base - datetime.timedelta(days=3), self.choice1)
+        self.vote_at(base - datetime.timedelta(hours=2), self.choice1)
+        self.vote_at(base - datetime.timedelta(minutes=10), self.choice2)
+
+        response = self.client.get(self.url, {'resolution': 'minute',
+                'since': '2013-05-01T09:30:00Z', 'until': '2013-05-01T09:31:00Z'})
+
+        data = json.loads(response.content)
+        self.assertEquals(data['series'][0]['votes'], [0, 0])
+        self.assertEquals(data['series'][0]['percentages'], [200 / 3.0, 100 / 3.0])
+
+    def test_history_rejects_bad_ranges(self):
+        for params in [{'resolution': 'week'}, {'since': 'yesterday'},
+                       {'since': '2013-05-02T00:00:00Z', 'until': '2013-05-01T00:00:00Z'},
+                       {'resolution': 'minute', 'since': '2013-01-01T00:00:00Z',
+                        'until': '2013-05-01T00:00:00Z'}]:
+            response = self.client.get(self.url, params)
+            self.assertEquals(response.status_code, 400)
@@ -0,0 +1,36 @@
+import random
+
+from django.test import TestCase
+from polls import bench
+from polls.models import Poll, Choice
+
+class BenchTest(TestCase):
+
+    def test_seed_creates_polls_choices_and_votes(self):
+        dataset = bench.seed(polls=3, choices=4, votes=10, rng=random.Random(0))
+
+        self.assertEquals(len(dataset), 3)
+        self.assertEquals(Choice.objects.count(), 12)
+        for poll in Poll.objects.all():
+            self.assertEquals(poll.votes, 10)
+            self.assertEquals(poll.results().total_votes, 10)
+
+    def test_percentile(self):
+        values = range(1, 101)
+
+        self.assertEquals(bench.percentile(values, 50), 51)
+        self.assertEquals(bench.percentile(values, 99), 99)
+        self.assertEquals(bench.percentile([], 50), None)
+
+    def test_run_scenario_reports_latency_and_queries(self):
+        dataset = bench.seed(polls=2, choices=2, votes=0)
+        poll_id = dataset.keys()[0]
+
+        report = bench.run_scenario(
+                lambda client, rng: client.get('/poll/%d/' % poll_id), requests=5)
+
+        self.assertEquals(report['requests'], 5)
+        self.assertEquals(report['errors'], 0)
+        self.assertEquals(report['queries']['max'], 2)
+        self.assertTrue(report['latency_ms']['p50'] <= report['latency_ms']['p99'])
+        self.assertTrue(report['throughput_rps'] > 0)
@@ -0,0 +1,97 @@
+from StringIO import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from mock import patch
+from polls.buffer import VoteBuffer, published_stats
+from polls.models import Poll, Choice
+
+@patch.object(VoteBuffer, 'start')
+class VoteBufferTest(TestCase):
+
+    def setUp(self):
+        self.poll = Poll(question='6 times 7', pub_date=timezone.now())
+        self.poll.save()
+        self.choice1 = Choice(poll=self.poll, choice='42', votes=0)
+        self.choice1.save()
+        self.choice2 = Choice(poll=self.poll, choice='The ultimate answer', votes=0)
+        self.choice2.save()
+        self.buffer = VoteBuffer(enabled=True, max_pending=10)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_votes_are_kept_in_memory_until_flushed(self, start):
+        for _ in range(3):
+            self.buffer.add(self.poll.id, self.choice1.id)
+        self.buffer.add(self.poll.id, self.choice2.id)
+
+        self.assertTrue(start.called)
+        self.assertEquals(self.buffer.depth, 4)
+        self.assertEquals(Choice.objects.get(pk=self.choice1.id).votes, 0)
+
+        with self.assertNumQueries(7):
+            self.assertEquals(self.buffer.flush(), 4)
+
+        self.assertEquals(self.buffer.depth, 0)
+        self.assertEquals(Choice.objects.get(pk=self.choice1.id).votes, 3)
+        self.assertEquals(Choice.objects.get(pk=self.choice2.id).votes, 1)
+        self.assertEquals(self.buffer.flush(), 0)
+
+    def test_buffer_flushes_once_max_pending_votes_are_waiting(self, start):
+        for _ in range(10):
+            self.buffer.add(self.poll.id, self.choice1.id)
+
+        self.assertEquals(self.buffer.depth, 0)
+        self.assertEquals(Choice.objects.get(pk=self.choice1.id).votes, 10)
+        self.assertEquals(self.buffer.flushed_votes, 10)
+        self.assertTrue(self.buffer.last_flush_latency_ms >= 0)
+
+    def test_flush_skips_choices_that_do_not_belong_to_the_poll(self, start):
+        other_poll = Poll(question='time', pub_date=timezone.now())
+        other_poll.save()
+
+        self.buffer.add(other_poll.id, self.choice1.id)
+
+        self.assertEquals(self.buffer.flush(), 0)
+        self.assertEquals(Choice.objects.get(pk=self.choice1.id).votes, 0)
+
+    @patch('polls.buffer.logger')
+    @patch('polls.buffer.record_vote', side_effect=Exception('database is down'))
+    def test_failed_flushes_keep_at_most_max_pending_votes(self, record_vote, logger, start):
+        for _ in range(8):
+            self.buffer.add(self.poll.id, self.choice1.id)
+        self.assertEquals(self.buffer.flush(), 0)
+        self.assertEquals(self.buffer.depth, 8)
+
+        for _ in range(5):
+            self.buffer.add(self.poll.id, self.choice2.id)
+
+        self.assertEquals(self.buffer.depth, 10)
+        self.assertEquals(self.buffer.dropped_votes, 3)
+        self.assertEquals(self.buffer.stats()['dropped_votes'], 3)
+
+    def test_pollstats_reports_published_buffers(self, start):
+        self.buffer.add(self.poll.id, self.choice1.id)
+        self.buffer.publish_stats()
+
+        [stats] = published_stats()
+        self.assertEquals(stats['depth'], 1)
+
+        output = StringIO()
+        call_command('pollstats', stdout=output)
+        self.assertIn('depth=1 flushed=0 dropped=0, never flushed', output.getvalue())
+
+    def test_poll_view_acknowledges_buffered_votes_without_writing(self, start):
+        with patch('polls.views.vote_buffer', self.buffer):
+            response = self.client.post('/poll/%d/' % (self.poll.id,),
+                    data={ 'vote': str(self.choice2.id) })
+
+        self.assertEquals(response.status_code, 302)
+        self.assertEquals(self.buffer.depth, 1)
+        self.assertEquals(Choice.objects.get(pk=self.choice2.id).votes, 0)
+
+        self.buffer.flush()
+        self.assertEquals(Choice.objects.get(pk=self.choice2.id).votes, 1)
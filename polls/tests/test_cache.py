@@ -0,0 +1,80 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from polls import cache as results_cache
+from polls.models import Poll, Choice
+
+class ResultsCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.poll = Poll(question='6 times 7', pub_date=timezone.now())
+        self.poll.save()
+        self.choice1 = Choice(poll=self.poll, choice='42', votes=1)
+        self.choice1.save()
+        self.choice2 = Choice(poll=self.poll, choice='The ultimate answer', votes=2)
+        self.choice2.save()
+        self.poll_url = '/poll/%d/' % (self.poll.id,)
+
+    def test_cached_poll_page_does_not_hit_the_database(self):
+        self.client.get(self.poll_url)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.poll_url)
+
+        self.assertIn('67 %: The ultimate answer', response.content)
+        self.assertIn('3 votes', response.content)
+        self.assertEquals(results_cache.stats(), {'hits': 1, 'misses': 1})
+
+    def test_per_process_cache_is_bypassed_unless_allowed(self):
+        with self.settings(DEBUG=False, POLLS_ALLOW_LOCAL_CACHE=False):
+            response = self.client.get(self.poll_url)
+            self.assertEquals(response.status_code, 200)
+            self.assertFalse(response.has_header('ETag'))
+            self.assertFalse(self.client.get('/').has_header('ETag'))
+
+            with self.assertNumQueries(2):
+                response = self.client.get(self.poll_url)
+            self.assertIn('3 votes', response.content)
+
+            response = self.client.get('/api/poll/%d/changes/' % (self.poll.id,),
+                    {'version': results_cache.results_version(self.poll.id)})
+            self.assertEquals(response.status_code, 200)
+
+    def test_votes_invalidate_cached_results(self):
+        self.client.get(self.poll_url)
+        version = results_cache.results_version(self.poll.id)
+
+        self.client.post(self.poll_url, data={ 'vote': str(self.choice1.id) })
+
+        self.assertNotEquals(results_cache.results_version(self.poll.id), version)
+        response = self.client.get(self.poll_url)
+        self.assertIn('50 %: 42', response.content)
+        self.assertIn('4 votes', response.content)
+
+    def test_edits_invalidate_cached_results(self):
+        self.client.get(self.poll_url)
+
+        self.poll.question = 'What is 6 times 7?'
+        self.poll.save()
+        self.choice2.choice = 'Forty-two'
+        self.choice2.save()
+
+        response = self.client.get(self.poll_url)
+        self.assertIn('What is 6 times 7?', response.content)
+        self.assertIn('Forty-two', response.content)
+
+    def test_deleted_polls_are_not_served_from_the_cache(self):
+        self.client.get(self.poll_url)
+
+        Poll.objects.filter(pk=self.poll.id).delete()
+
+        response = self.client.get(self.poll_url)
+        self.assertEquals(response.status_code, 404)
+
+    def test_evicted_versions_do_not_resurrect_old_results(self):
+        version = results_cache.results_version(self.poll.id)
+
+        cache.delete(results_cache.VERSION_KEY % (self.poll.id,))
+
+        self.assertNotEquals(results_cache.bump_results_version(self.poll.id), version + 1)
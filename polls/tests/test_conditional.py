@@ -0,0 +1,69 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from mock import patch
+from polls.leaderboard import LEADERBOARDS_KEY, current_period
+from polls.models import Poll, Choice
+
+class ConditionalGetTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.poll = Poll(question='6 times 7', pub_date=timezone.now())
+        self.poll.save()
+        self.choice = Choice(poll=self.poll, choice='42', votes=0)
+        self.choice.save()
+        self.poll_url = '/poll/%d/' % (self.poll.id,)
+
+    def test_home_page_answers_304_until_a_poll_changes(self):
+        response = self.client.get('/')
+        etag = response['ETag']
+        cache_control = response['Cache-Control'].split(', ')
+        self.assertEquals(sorted(cache_control),
+                ['max-age=0', 'must-revalidate', 'public'])
+
+        response = self.client.get('/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(response.status_code, 304)
+        self.assertEquals(response.templates, [])
+
+        Poll(question='time', pub_date=timezone.now()).save()
+
+        response = self.client.get('/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(response.status_code, 200)
+        self.assertIn('time', response.content)
+
+    @patch('polls.leaderboard.time')
+    def test_home_page_304s_do_not_build_the_leaderboards(self, time):
+        time.time.return_value = 1000000.0
+        etag = self.client.get('/')['ETag']
+        cache.delete(LEADERBOARDS_KEY % current_period())
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(response.status_code, 304)
+
+    def test_home_page_etag_depends_on_the_page(self):
+        first_page = self.client.get('/')['ETag']
+        other_page = self.client.get('/?after=0-0')['ETag']
+
+        self.assertNotEquals(first_page, other_page)
+
+    def test_poll_page_answers_304_until_someone_votes(self):
+        response = self.client.get(self.poll_url)
+        self.assertFalse(response.has_header('ETag'))
+
+        response = self.client.get(self.poll_url)
+        etag = response['ETag']
+        self.assertEquals(response['Vary'], 'Cookie')
+        self.assertIn('private', response['Cache-Control'])
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.poll_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(response.status_code, 304)
+        self.assertEquals(response.templates, [])
+
+        self.client.post(self.poll_url, data={ 'vote': str(self.choice.id) })
+
+        response = self.client.get(self.poll_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(response.status_code, 200)
+        self.assertIn('1 vote', response.content)
@@ -0,0 +1,33 @@
+from django.core import signals
+from django.db import connection
+from django.test import TestCase
+from polls.db import sqlite_pragmas, release_connections
+
+class SQLiteConnectionTest(TestCase):
+
+    def pragma(self, name):
+        cursor = connection.cursor()
+        cursor.execute('PRAGMA %s' % name)
+        return cursor.fetchone()[0]
+
+    def test_new_connections_use_wal_and_a_busy_timeout(self):
+        self.assertEquals(self.pragma('journal_mode'), 'wal')
+        self.assertEquals(self.pragma('busy_timeout'), 5000)
+        self.assertEquals(self.pragma('synchronous'), 1)
+        self.assertEquals(self.pragma('cache_size'), -16384)
+
+    def test_pragmas_follow_settings(self):
+        options = {'JOURNAL_MODE': None, 'SYNCHRONOUS': 'FULL',
+                   'CACHE_SIZE_KB': None, 'BUSY_TIMEOUT_MS': 100}
+
+        self.assertEquals(sqlite_pragmas(options),
+                ['PRAGMA busy_timeout = 100', 'PRAGMA synchronous = FULL'])
+
+    def test_connections_are_kept_at_the_end_of_a_request(self):
+        connection.cursor()
+        sqlite_connection = connection.connection
+
+        self.assertIn(release_connections, [r() for _, r in signals.request_finished.receivers])
+        release_connections()
+
+        self.assertIs(connection.connection, sqlite_connection)
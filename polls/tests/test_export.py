@@ -0,0 +1,68 @@
+import json
+from StringIO import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from polls.export import export_rows
+from polls.models import Poll, Choice
+
+class ExportTest(TestCase):
+
+    def setUp(self):
+        self.poll1 = Poll(question=u'6 times 7 \u2248', pub_date=timezone.now())
+        self.poll1.save()
+        self.choice1 = Choice(poll=self.poll1, choice='42', votes=3)
+        self.choice1.save()
+        self.choice2 = Choice(poll=self.poll1, choice='43', votes=1)
+        self.choice2.save()
+        self.poll2 = Poll(question='time', pub_date=timezone.now())
+        self.poll2.save()
+
+    def test_export_rows_cover_every_choice_and_empty_poll(self):
+        rows = list(export_rows(chunk_size=1))
+
+        self.assertEquals([(r['poll_id'], r['choice_id'], r['votes']) for r in rows], [
+            (self.poll1.id, self.choice1.id, 3),
+            (self.poll1.id, self.choice2.id, 1),
+            (self.poll2.id, None, None),
+        ])
+
+    def test_export_reads_the_database_in_chunks(self):
+        for i in range(4):
+            Poll(question='poll %d' % i, pub_date=timezone.now()).save()
+
+        # Two queries per chunk of polls, plus the final empty chunk.
+        with self.assertNumQueries(7):
+            self.assertEquals(len(list(export_rows(chunk_size=2))), 7)
+
+    def test_export_command_writes_csv(self):
+        output = StringIO()
+        call_command('export_polls', stdout=output)
+
+        lines = output.getvalue().splitlines()
+        self.assertEquals(lines[0], 'poll_id,question,pub_date,choice_id,choice,votes')
+        self.assertEquals(len(lines), 4)
+        self.assertIn('42,3', lines[1])
+        self.assertIn(u'6 times 7 \u2248'.encode('utf-8'), lines[1])
+
+    def test_export_command_writes_ndjson(self):
+        output = StringIO()
+        call_command('export_polls', format='ndjson', stdout=output)
+
+        rows = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEquals([r['votes'] for r in rows], [3, 1, None])
+
+    def test_export_endpoint_is_for_staff_only(self):
+        response = self.client.get('/export/polls.csv')
+        self.assertTemplateUsed(response, 'admin/login.html')
+
+        staff = User.objects.create_user('staff', 'staff@example.com', 'staff')
+        staff.is_staff = True
+        staff.save()
+        self.client.login(username='staff', password='staff')
+
+        response = self.client.get('/export/polls.ndjson')
+        self.assertEquals(response['Content-Type'], 'application/x-ndjson')
+        self.assertEquals(len(response.content.splitlines()), 3)
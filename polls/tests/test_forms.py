@@ -28,3 +28,29 @@ class PollsVoteFormTest(TestCase):
         ])
 
         self.assertIn('input type="radio"', form.as_p())
+
+    def test_form_uses_preloaded_choices_without_querying(self):
+        poll = Poll(question='6 times 7', pub_date=timezone.now())
+        poll.save()
+        choice = Choice(poll=poll, choice='42', votes=0)
+        choice.save()
+        choices = list(poll.choice_set.all())
+
+        with self.assertNumQueries(0):
+            form = PollVoteForm(poll=poll, choices=choices, data={'vote': str(choice.id)})
+            self.assertTrue(form.is_valid())
+
+        self.assertEquals(form.cleaned_data['vote'], choice.id)
+
+    def test_form_rejects_choices_of_another_poll(self):
+        poll1 = Poll(question='6 times 7', pub_date=timezone.now())
+        poll1.save()
+        Choice(poll=poll1, choice='42', votes=0).save()
+        poll2 = Poll(question='time', pub_date=timezone.now())
+        poll2.save()
+        other = Choice(poll=poll2, choice='PM', votes=0)
+        other.save()
+
+        for vote in [str(other.id), 'nope', '']:
+            form = PollVoteForm(poll=poll1, data={'vote': vote})
+            self.assertFalse(form.is_valid())
@@ -0,0 +1,83 @@
+import json
+import os
+import tempfile
+from StringIO import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from polls.importer import PollImportError, import_polls, read_ndjson
+from polls.models import Poll, Choice
+from polls.search import search_available
+
+def poll_line(i, choices=('yes', 'no')):
+    return json.dumps({
+        'question': 'poll %d' % i,
+        'pub_date': '2012-06-22T07:49:%02d' % i,
+        'choices': [{'choice': choices[0], 'votes': i}] + list(choices[1:]),
+    }) + '\n'
+
+class ImportPollsTest(TestCase):
+
+    def write_file(self, content, suffix):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        os.write(fd, content)
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def import_file(self, path, **options):
+        output = StringIO()
+        call_command('import_polls', path, stdout=output, **options)
+        return output.getvalue()
+
+    def test_import_ndjson_in_batches(self):
+        path = self.write_file(''.join(poll_line(i) for i in range(5)), '.ndjson')
+
+        output = self.import_file(path, batch_size=2)
+
+        self.assertIn('Imported 5 polls and 10 choices', output)
+        self.assertEquals(Poll.objects.count(), 5)
+        poll = Poll.objects.get(question='poll 3')
+        self.assertEquals(poll.votes, 3)
+        self.assertEquals(sorted(poll.choice_set.values_list('choice', 'votes')),
+                [(u'no', 0), (u'yes', 3)])
+
+    def test_import_csv(self):
+        path = self.write_file(
+            'question,pub_date,choice,votes\n'
+            'Beer?,2012-06-22T07:49:00Z,Yes,2\n'
+            'Beer?,2012-06-22T07:49:00Z,No,1\n'
+            'Pizza?,2012-06-23 10:00,Margherita,\n', '.csv')
+
+        self.import_file(path)
+
+        self.assertEquals(Poll.objects.count(), 2)
+        self.assertEquals(Poll.objects.get(question='Beer?').votes, 3)
+        self.assertEquals(Choice.objects.filter(poll__question='Pizza?').count(), 1)
+
+    def test_import_resumes_without_duplicates(self):
+        good = ''.join(poll_line(i) for i in range(4))
+        path = self.write_file(good + '{"question": "broken"}\n', '.ndjson')
+
+        with open(path) as lines:
+            batches = import_polls(read_ndjson(lines), batch_size=2)
+            self.assertRaises(PollImportError, list, batches)
+        self.assertEquals(Poll.objects.count(), 4)
+
+        path = self.write_file(good + poll_line(4), '.ndjson')
+        output = self.import_file(path, batch_size=2)
+
+        self.assertIn('Imported 1 polls and 2 choices', output)
+        self.assertIn('skipped 4 existing polls', output)
+        self.assertEquals(Poll.objects.count(), 5)
+        self.assertEquals(Choice.objects.count(), 10)
+
+    def test_import_uses_multi_row_inserts(self):
+        path = self.write_file(''.join(poll_line(i) for i in range(10)), '.ndjson')
+
+        search_available('default')
+
+        # Two existence checks and one INSERT per table for the whole batch,
+        # then a DELETE and an INSERT of the batch's search index entries.
+        with self.assertNumQueries(6):
+            self.import_file(path, batch_size=10, verbosity=0)
@@ -0,0 +1,87 @@
+import datetime
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from mock import patch
+from polls.leaderboard import top_polls, trending_polls, trending_score
+from polls.models import Poll, Choice
+from polls.votes import record_vote, rollup_shards
+
+class LeaderboardTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.now = datetime.datetime(2013, 5, 1, 12, 0, tzinfo=timezone.utc)
+        self.polls = []
+        for i in range(3):
+            poll = Poll(question='poll %d' % i, pub_date=timezone.now())
+            poll.save()
+            Choice(poll=poll, choice='42', votes=0).save()
+            self.polls.append(poll)
+
+    def tearDown(self):
+        cache.clear()
+
+    def vote(self, poll, count, hours_ago):
+        when = self.now - datetime.timedelta(hours=hours_ago)
+        with patch('polls.votes.timezone.now', return_value=when):
+            record_vote(poll, poll.choice_set.get().id, count)
+
+    def test_votes_update_top_and_trending_polls(self):
+        self.vote(self.polls[0], 10, hours_ago=5)
+        self.vote(self.polls[1], 4, hours_ago=0)
+        self.vote(self.polls[1], 1, hours_ago=1)
+
+        self.assertEquals([p.id for p in top_polls(2)], [self.polls[0].id, self.polls[1].id])
+        self.assertEquals([p.id for p in trending_polls(5)], [self.polls[1].id, self.polls[0].id])
+        poll = Poll.objects.get(pk=self.polls[1].id)
+        self.assertAlmostEquals(poll.trending, trending_score(4.5, self.now))
+
+    def test_sharded_votes_trend_once_rolled_up(self):
+        self.polls[2].vote_mode = Poll.SHARDED_VOTES
+        self.polls[2].save()
+        self.vote(self.polls[2], 3, hours_ago=0)
+        self.assertEquals(trending_polls(5), [])
+
+        rollup_shards()
+
+        self.assertEquals([p.id for p in trending_polls(5)], [self.polls[2].id])
+
+    def test_rebuild_regenerates_totals_and_trending_scores(self):
+        self.vote(self.polls[0], 10, hours_ago=5)
+        self.vote(self.polls[1], 4, hours_ago=0)
+        Poll.objects.update(votes=0, trending=None)
+
+        call_command('rebuild_leaderboards', verbosity=0)
+
+        self.assertEquals([p.id for p in top_polls(2)], [self.polls[0].id, self.polls[1].id])
+        self.assertEquals([p.id for p in trending_polls(5)], [self.polls[1].id, self.polls[0].id])
+        poll = Poll.objects.get(pk=self.polls[1].id)
+        self.assertAlmostEquals(poll.trending,
+                trending_score(4, self.now.replace(minute=30)))
+
+    def test_home_page_lists_the_leaderboards(self):
+        self.vote(self.polls[2], 2, hours_ago=0)
+
+        response = self.client.get('/')
+
+        self.assertEquals([p.id for p in response.context['top_polls']][:1], [self.polls[2].id])
+        self.assertEquals([p.id for p in response.context['trending_polls']], [self.polls[2].id])
+        self.assertIn('Trending', response.content)
+
+class LeaderboardIndexTest(TestCase):
+
+    # Kept away from test data: the sqlite3 module commits before running
+    # an EXPLAIN.
+    def test_leaderboards_are_read_from_indexes(self):
+        cursor = connection.cursor()
+        for queryset in [Poll.objects.order_by('-votes', '-id')[:10],
+                         Poll.objects.filter(trending__isnull=False).order_by('-trending', '-id')[:10]]:
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+            self.assertIn('INDEX', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
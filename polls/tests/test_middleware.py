@@ -0,0 +1,47 @@
+from django.test import TestCase
+from django.utils import timezone
+from mock import patch
+from polls.models import Poll, Choice
+
+class RequestMetricsMiddlewareTest(TestCase):
+
+    def setUp(self):
+        self.poll = Poll(question='6 times 7', pub_date=timezone.now())
+        self.poll.save()
+        Choice(poll=self.poll, choice='42', votes=1).save()
+
+    def test_metrics_are_sent_as_response_headers(self):
+        with self.settings(POLLS_METRICS_HEADERS=True):
+            response = self.client.get('/api/poll/%d/' % (self.poll.id,))
+
+        self.assertEquals(response['X-Polls-Queries'], '2')
+        for header in ['X-Polls-SQL-Time-Ms', 'X-Polls-Render-Time-Ms', 'X-Polls-Time-Ms']:
+            self.assertTrue(float(response[header]) >= 0)
+
+    def test_headers_can_be_turned_off(self):
+        with self.settings(POLLS_METRICS_HEADERS=False):
+            response = self.client.get('/')
+
+        self.assertFalse(response.has_header('X-Polls-Queries'))
+
+    @patch('polls.middleware.logger')
+    def test_metrics_are_logged_per_view(self, logger):
+        self.client.get('/poll/%d/' % (self.poll.id,))
+
+        metrics = logger.info.call_args[1]['extra']['metrics']
+        self.assertEquals(metrics['view'], 'polls.views.poll')
+        self.assertEquals(metrics['status'], 200)
+        self.assertTrue(metrics['render_ms'] > 0)
+        self.assertTrue(metrics['total_ms'] >= metrics['render_ms'])
+
+    @patch('polls.middleware.logger')
+    def test_queries_are_only_counted_when_asked_for(self, logger):
+        with self.settings(DEBUG=False, POLLS_METRICS_SQL=False, POLLS_METRICS_HEADERS=True):
+            with patch('polls.middleware.connections') as connections:
+                response = self.client.get('/api/poll/%d/' % (self.poll.id,))
+
+        self.assertFalse(connections.all.called)
+        self.assertFalse(response.has_header('X-Polls-Queries'))
+        self.assertTrue(float(response['X-Polls-Time-Ms']) >= 0)
+        metrics = logger.info.call_args[1]['extra']['metrics']
+        self.assertEquals(metrics['queries'], None)
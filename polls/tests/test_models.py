@@ -1,6 +1,7 @@
 from django.test import TestCase
 from django.utils import timezone
 from polls.models import Poll, Choice
+from polls.votes import record_vote
 
 class PollModelTest(TestCase):
     def test_creating_a_new_poll_and_saving_it_to_the_database(self):
@@ -45,6 +46,38 @@ class PollModelTest(TestCase):
 
         self.assertEquals(poll1.total_votes(), 122)
 
+    def test_total_votes_are_stored_on_the_poll(self):
+        poll1 = Poll(question='who?', pub_date=timezone.now())
+        poll1.save()
+        choice1 = Choice(poll=poll1, choice="me", votes=5)
+        choice1.save()
+        choice2 = Choice(poll=poll1, choice="you", votes=2)
+        choice2.save()
+
+        poll_from_db = Poll.objects.get(pk=poll1.id)
+        self.assertEquals(poll_from_db.votes, 7)
+        with self.assertNumQueries(0):
+            self.assertEquals(poll_from_db.total_votes(), 7)
+
+        choice2.delete()
+        self.assertEquals(Poll.objects.get(pk=poll1.id).votes, 5)
+
+    def test_saving_a_stale_poll_keeps_votes_cast_since_it_was_loaded(self):
+        poll = Poll(question='who?', pub_date=timezone.now())
+        poll.save()
+        choice = Choice(poll=poll, choice="me", votes=0)
+        choice.save()
+        stale = Poll.objects.get(pk=poll.id)
+
+        record_vote(poll, choice.id, count=3)
+        stale.question = 'who is it?'
+        stale.save()
+
+        poll_from_db = Poll.objects.get(pk=poll.id)
+        self.assertEquals(poll_from_db.question, 'who is it?')
+        self.assertEquals(poll_from_db.votes, 3)
+        self.assertNotEquals(poll_from_db.trending, None)
+
 class ChoiceModelTest(TestCase):
 
     def test_creating_some_choices_for_a_poll(self):
@@ -89,3 +122,32 @@ class ChoiceModelTest(TestCase):
 
         self.assertEquals(choice1.percentage(), 0)
         self.assertEquals(choice2.percentage(), 0)
+
+    def test_poll_results_come_from_a_single_query(self):
+        poll1 = Poll(question='who?', pub_date=timezone.now())
+        poll1.save()
+        choice1 = Choice(poll=poll1, choice="me", votes=3)
+        choice1.save()
+        choice2 = Choice(poll=poll1, choice="you", votes=1)
+        choice2.save()
+
+        with self.assertNumQueries(1):
+            results = poll1.results()
+
+        self.assertEquals(results.total_votes, 4)
+        self.assertEquals([(c.id, c.choice, c.votes) for c in results.choices], [
+            (choice1.id, 'me', 3),
+            (choice2.id, 'you', 1),
+        ])
+        self.assertEquals(results.choices[0].percentage, 75)
+        self.assertEquals(results.choices[1].percentage, 25)
+
+    def test_poll_results_without_votes_have_zero_percentages(self):
+        poll1 = Poll(question='who?', pub_date=timezone.now())
+        poll1.save()
+        Choice(poll=poll1, choice="me", votes=0).save()
+
+        results = poll1.results()
+
+        self.assertEquals(results.total_votes, 0)
+        self.assertEquals(results.choices[0].percentage, 0)
@@ -0,0 +1,111 @@
+import marshal
+import cProfile
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.test.client import Client
+from django.utils import timezone
+from mock import patch
+from polls.models import Poll, Choice
+from polls.profiling import ProfileStore, profiles
+
+def _profile(function):
+    profiler = cProfile.Profile()
+    profiler.runcall(function)
+    return profiler
+
+class ProfileStoreTest(TestCase):
+
+    def test_profiles_of_a_view_are_merged(self):
+        store = ProfileStore()
+        store.add('polls.views.poll', _profile(lambda: sorted(range(10))))
+        store.add('polls.views.poll', _profile(lambda: sorted(range(10))))
+
+        self.assertEquals(store.views(), [('polls.views.poll', 2)])
+        stats = marshal.loads(store.dump('polls.views.poll'))
+        calls = [value[1] for key, value in stats.items() if key[2] == "<sorted>"]
+        self.assertEquals(calls, [2])
+        self.assertIn('sorted', store.report('polls.views.poll'))
+
+    def test_least_recently_profiled_view_is_dropped(self):
+        store = ProfileStore(max_views=2)
+        for view in ['a', 'b', 'a', 'c']:
+            store.add(view, _profile(lambda: None))
+
+        self.assertEquals(store.views(), [('c', 1), ('a', 2)])
+        self.assertEquals(store.dump('b'), None)
+        self.assertEquals(store.report('b'), None)
+
+class ProfilingMiddlewareTest(TestCase):
+
+    def setUp(self):
+        profiles.clear()
+        self.poll = Poll(question='6 times 7', pub_date=timezone.now())
+        self.poll.save()
+        Choice(poll=self.poll, choice='42', votes=1).save()
+        staff = User.objects.create_user('staff', 'staff@example.com', 'staff')
+        staff.is_staff = True
+        staff.save()
+
+    def tearDown(self):
+        profiles.clear()
+
+    def test_requests_are_not_profiled_by_default(self):
+        self.client.get('/poll/%d/' % (self.poll.id,), HTTP_X_POLLS_PROFILE='1')
+
+        self.assertEquals(profiles.views(), [])
+
+    def test_staff_can_ask_for_a_profile(self):
+        self.client.login(username='staff', password='staff')
+        self.client.get('/poll/%d/' % (self.poll.id,), HTTP_X_POLLS_PROFILE='1')
+
+        self.assertEquals(profiles.views(), [('polls.views.poll', 1)])
+        # Template rendering is part of the profile.
+        self.assertIn('render', profiles.report('polls.views.poll', limit=100))
+
+    @patch('polls.middleware.random.random')
+    def test_a_fraction_of_requests_is_sampled(self, random):
+        random.side_effect = [0.05, 0.5]
+        with self.settings(POLLS_PROFILING={'ENABLED': True, 'SAMPLE_RATE': 0.1}):
+            client = Client()
+            client.get('/poll/%d/' % (self.poll.id,))
+            client.get('/poll/%d/' % (self.poll.id,))
+
+        self.assertEquals(profiles.views(), [('polls.views.poll', 1)])
+
+    def test_middleware_can_be_turned_off(self):
+        with self.settings(POLLS_PROFILING={'ENABLED': False}):
+            client = Client()
+            client.login(username='staff', password='staff')
+            client.get('/', HTTP_X_POLLS_PROFILE='1')
+
+        self.assertEquals(profiles.views(), [])
+
+    def test_reports_are_for_staff_only(self):
+        self.client.login(username='staff', password='staff')
+        self.client.get('/poll/%d/' % (self.poll.id,), HTTP_X_POLLS_PROFILE='1')
+        self.client.logout()
+
+        for url in ['/profiles/', '/profiles/polls.views.poll/',
+                    '/profiles/polls.views.poll.pstats']:
+            response = self.client.get(url)
+            self.assertTemplateUsed(response, 'admin/login.html')
+
+    def test_staff_can_read_reports_and_download_stats(self):
+        self.client.login(username='staff', password='staff')
+        self.client.get('/poll/%d/' % (self.poll.id,), HTTP_X_POLLS_PROFILE='1')
+
+        response = self.client.get('/profiles/')
+        self.assertIn('polls.views.poll\t1 samples', response.content)
+
+        response = self.client.get('/profiles/polls.views.poll/?n=5&sort=time')
+        self.assertEquals(response['Content-Type'], 'text/plain')
+        self.assertIn('function calls', response.content)
+
+        response = self.client.get('/profiles/polls.views.poll.pstats')
+        self.assertEquals(response['Content-Disposition'],
+                'attachment; filename=polls.views.poll.pstats')
+        self.assertTrue(marshal.loads(response.content))
+
+        self.assertEquals(self.client.get('/profiles/polls.views.home/').status_code, 404)
+        self.assertEquals(self.client.get('/profiles/polls.views.poll/?sort=x').status_code, 400)
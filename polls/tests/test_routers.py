@@ -0,0 +1,100 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+from polls.importer import import_polls
+from polls.models import Poll, Choice
+from polls.routers import use_primary
+from polls.votes import find_vote_drift
+from polls.warmup import hot_polls
+
+# The replica's test database is never written to, so it behaves like a
+# replica that has not caught up with anything yet.
+@override_settings(POLLS_DATABASE_REPLICAS=('replica',))
+class PrimaryReplicaRoutingTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.poll = Poll(question='6 times 7', pub_date=timezone.now())
+        self.poll.save()
+        self.choice = Choice(poll=self.poll, choice='42', votes=0)
+        self.choice.save()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_reads_go_to_replicas_and_writes_to_the_primary(self):
+        self.assertEquals(router.db_for_read(Poll), 'replica')
+        self.assertEquals(router.db_for_write(Poll), 'default')
+        self.assertEquals(self.poll._state.db, 'default')
+        self.assertFalse(Poll.objects.filter(pk=self.poll.id).exists())
+
+        with use_primary():
+            self.assertEquals(router.db_for_read(Poll), 'default')
+            self.assertTrue(Poll.objects.filter(pk=self.poll.id).exists())
+        self.assertEquals(router.db_for_read(Poll), 'replica')
+
+    def test_api_reads_from_replicas(self):
+        response = self.client.get('/api/poll/%d/' % (self.poll.id,))
+
+        self.assertEquals(response.status_code, 404)
+
+    def test_cached_results_are_filled_from_the_primary(self):
+        response = self.client.get('/poll/%d/' % (self.poll.id,))
+
+        self.assertEquals(response.status_code, 200)
+        self.assertIn('6 times 7', response.content)
+
+    def test_voters_read_their_votes_from_the_primary(self):
+        response = self.client.post('/poll/%d/' % (self.poll.id,),
+                data={ 'vote': str(self.choice.id) })
+
+        self.assertEquals(response.status_code, 302)
+        self.assertIn(settings.POLLS_PIN_PRIMARY_COOKIE, response.cookies)
+
+        response = self.client.get('/api/poll/%d/' % (self.poll.id,))
+        self.assertEquals(response.status_code, 200)
+        self.assertIn('"total_votes": 1', response.content)
+
+    def test_choice_saves_recount_votes_on_the_primary(self):
+        with use_primary():
+            choice = Choice.objects.get(pk=self.choice.id)
+        choice.votes = 5
+        choice.save()
+
+        with use_primary():
+            self.assertEquals(Poll.objects.get(pk=self.poll.id).votes, 5)
+
+    def test_recount_goes_to_the_primary_for_polls_read_from_a_replica(self):
+        self.poll._state.db = 'replica'
+        Choice.objects.filter(pk=self.choice.id).update(votes=3)
+
+        self.poll.recount_votes()
+
+        self.assertEquals(self.poll.votes, 3)
+
+    def test_import_finds_the_polls_it_just_inserted(self):
+        polls = [('new poll', timezone.now(), [('yes', 2), ('no', 0)])]
+
+        self.assertEquals(list(import_polls(polls)), [(1, 2, 0)])
+
+    def test_vote_drift_is_read_from_the_primary(self):
+        Poll.objects.filter(pk=self.poll.id).update(votes=10)
+
+        self.assertEquals(list(find_vote_drift()), [(self.poll.id, 10, 0)])
+
+    def test_hot_polls_are_read_from_the_primary(self):
+        self.assertEquals(hot_polls(10), [self.poll.id])
+
+    def test_home_page_etag_never_validates_a_page_from_a_replica(self):
+        etag = self.client.get('/')['ETag']
+        Poll(question='time', pub_date=timezone.now()).save()
+
+        response = self.client.get('/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(response.status_code, 200)
+        self.assertIn('time', response.content)
+
+        response = self.client.get('/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEquals(response.status_code, 304)
@@ -0,0 +1,84 @@
+import json
+
+from django.core.management import call_command
+from django.db import connection, DatabaseError
+from django.test import TestCase
+from django.utils import timezone
+from mock import patch
+from polls.importer import import_polls
+from polls.models import Poll, Choice
+from polls.search import create_search_table, search_polls
+
+class SearchTest(TestCase):
+
+    def create_poll(self, question, choices=()):
+        poll = Poll(question=question, pub_date=timezone.now())
+        poll.save()
+        for choice in choices:
+            Choice(poll=poll, choice=choice, votes=0).save()
+        return poll
+
+    def test_search_matches_questions_and_choices_best_first(self):
+        food = self.create_poll('Which food do you prefer?', ['Beer', 'Pizza'])
+        pizza = self.create_poll('Pizza or pizza?', ['Pizza', 'Pasta'])
+        self.create_poll('How awesome is TDD?', ['Very awesome'])
+
+        self.assertEquals([poll_id for poll_id, _ in search_polls('pizza')],
+                          [pizza.id, food.id])
+        self.assertEquals(search_polls('which BEER'), [(food.id, 'Which food do you prefer?')])
+        self.assertEquals(search_polls('awe'), search_polls('awesome'))
+        # Operators are searched as words.
+        self.assertEquals(search_polls('"pasta OR'), [(pizza.id, 'Pizza or pizza?')])
+        self.assertEquals(search_polls('pasta"'), [(pizza.id, 'Pizza or pizza?')])
+        self.assertEquals(search_polls(''), [])
+
+    def test_index_follows_saves_deletes_and_imports(self):
+        poll = self.create_poll('Which food do you prefer?', ['Beer'])
+        choice = poll.choice_set.get()
+
+        choice.choice = 'Wine'
+        choice.save()
+        self.assertEquals(search_polls('beer'), [])
+        self.assertEquals(search_polls('wine'), [(poll.id, poll.question)])
+
+        poll.delete()
+        self.assertEquals(search_polls('food'), [])
+
+        list(import_polls([('Favourite colour?', timezone.now(), [('Teal', 0)])]))
+        self.assertEquals(len(search_polls('teal')), 1)
+
+    def test_rebuild_command_reindexes_every_poll(self):
+        poll = self.create_poll('Which food do you prefer?', ['Beer'])
+        connection.cursor().execute('DELETE FROM polls_poll_search')
+        self.assertEquals(search_polls('beer'), [])
+
+        call_command('rebuild_poll_search', chunk_size=1, verbosity=0)
+
+        self.assertEquals(search_polls('beer'), [(poll.id, poll.question)])
+
+    def test_search_api_pages_through_results(self):
+        for i in range(3):
+            self.create_poll('Pizza poll %d' % i)
+
+        with self.settings(POLLS_SEARCH_PAGE_SIZE=2):
+            page1 = json.loads(self.client.get('/api/search/', {'q': 'pizza'}).content)
+            page2 = json.loads(self.client.get('/api/search/',
+                    {'q': 'pizza', 'page': page1['next_page']}).content)
+
+        self.assertEquals(len(page1['polls']), 2)
+        self.assertEquals(len(page2['polls']), 1)
+        self.assertEquals(page2['next_page'], None)
+        self.assertEquals(self.client.get('/api/search/', {'page': '0'}).status_code, 400)
+
+class SearchTableTest(TestCase):
+
+    # Kept away from test data: the sqlite3 module commits before running
+    # DDL.
+    def test_search_table_is_created_apart_from_the_custom_sql(self):
+        self.assertTrue(create_search_table('default'))
+
+        with patch('polls.search.connections') as connections:
+            connections.__getitem__.return_value.vendor = 'sqlite'
+            connections.__getitem__.return_value.cursor.return_value.execute.side_effect = \
+                    DatabaseError('no such module: fts5')
+            self.assertFalse(create_search_table('default'))
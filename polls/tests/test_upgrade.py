@@ -0,0 +1,54 @@
+import os
+import sqlite3
+
+from django.test import TestCase
+from polls.models import Poll
+
+UPGRADE_SQL = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                           'sql', 'upgrade.sqlite3.sql')
+
+class UpgradeSqlTest(TestCase):
+
+    def setUp(self):
+        # The polls tables as syncdb created them before the upgrade.
+        self.db = sqlite3.connect(':memory:')
+        self.db.executescript('''
+            CREATE TABLE "polls_poll" (
+                "id" integer NOT NULL PRIMARY KEY,
+                "question" varchar(200) NOT NULL,
+                "pub_date" datetime NOT NULL
+            );
+            CREATE TABLE "polls_choice" (
+                "id" integer NOT NULL PRIMARY KEY,
+                "poll_id" integer NOT NULL REFERENCES "polls_poll" ("id"),
+                "choice" varchar(200) NOT NULL,
+                "votes" integer NOT NULL
+            );
+            INSERT INTO polls_poll VALUES (1, '6 times 7', '2013-05-01 09:00:00');
+            INSERT INTO polls_poll VALUES (2, 'No choices', '2013-05-01 09:00:00');
+            INSERT INTO polls_choice VALUES (1, 1, '42', 3);
+            INSERT INTO polls_choice VALUES (2, 1, '54', 2);
+        ''')
+
+    def tearDown(self):
+        self.db.close()
+
+    def upgrade(self):
+        with open(UPGRADE_SQL) as f:
+            self.db.executescript(f.read())
+
+    def test_adds_the_columns_and_indexes_of_polls(self):
+        self.upgrade()
+
+        columns = [row[1] for row in self.db.execute('PRAGMA table_info(polls_poll)')]
+        self.assertEquals(columns, [f.column for f in Poll._meta.fields])
+        indexes = set(row[1] for row in self.db.execute('PRAGMA index_list(polls_poll)'))
+        self.assertEquals(indexes, set(['polls_poll_da122a89', 'polls_poll_560da84c',
+                'polls_poll_pub_date_id', 'polls_poll_question_nocase']))
+
+    def test_fills_in_vote_totals_and_modes(self):
+        self.upgrade()
+
+        self.assertEquals(list(self.db.execute(
+                'SELECT id, vote_mode, votes, trending FROM polls_poll ORDER BY id')),
+                [(1, Poll.DIRECT_VOTES, 5, None), (2, Poll.DIRECT_VOTES, 0, None)])
@@ -1,8 +1,20 @@
+from datetime import datetime, timedelta
+
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
 from django.utils import timezone
 from polls.models import Poll, Choice
 from django.core.urlresolvers import reverse
 from polls.forms import PollVoteForm
+from polls.tests.helpers import QueryBudgetMixin
+
+# Maximum number of queries each view may run on a cold cache.
+QUERY_BUDGETS = {
+    'home': 3,
+    'poll': 2,
+    'vote': 5,
+}
 
 class HomePageViewTest(TestCase):
 
@@ -29,7 +41,7 @@ class HomePageViewTest(TestCase):
         self.assertIn('home.html', template_names_used)
 
         polls_in_context = response.context['polls']
-        self.assertEquals(list(polls_in_context), [poll1, poll2])
+        self.assertEquals([p.pk for p in polls_in_context], [poll1.pk, poll2.pk])
 
         self.assertIn(poll1.question, response.content)
         self.assertIn(poll2.question, response.content)
@@ -39,6 +51,61 @@ class HomePageViewTest(TestCase):
         poll2_url = reverse('polls.views.poll', args=[poll2.id,])
         self.assertIn(poll2_url, response.content)
 
+    def test_home_page_is_paginated_by_publication_date(self):
+        now = timezone.now()
+        polls = []
+        for minutes in [3, 1, 2, 2, 0]:
+            poll = Poll(question='poll %d' % len(polls),
+                    pub_date=now - timedelta(minutes=minutes))
+            poll.save()
+            polls.append(poll)
+        expected = [polls[0], polls[2], polls[3], polls[1], polls[4]]
+
+        seen = []
+        url = '/'
+        with self.settings(POLLS_HOME_PAGE_SIZE=2):
+            while url:
+                response = self.client.get(url)
+                seen.extend(p.pk for p in response.context['polls'])
+                cursor = response.context['next_cursor']
+                url = cursor and '/?after=%s' % (cursor,)
+
+        self.assertEquals(seen, [p.pk for p in expected])
+
+    def test_home_page_pagination_goes_past_polls_from_before_1970(self):
+        old = Poll(question='old', pub_date=datetime(1960, 1, 1, tzinfo=timezone.utc))
+        old.save()
+        new = Poll(question='new', pub_date=timezone.now())
+        new.save()
+
+        with self.settings(POLLS_HOME_PAGE_SIZE=1):
+            response = self.client.get('/')
+            self.assertEquals([p.pk for p in response.context['polls']], [old.pk])
+            response = self.client.get('/?after=%s' % (response.context['next_cursor'],))
+
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals([p.pk for p in response.context['polls']], [new.pk])
+
+    def test_deep_home_pages_use_the_same_queries_as_the_first(self):
+        for i in range(5):
+            Poll(question='poll %d' % i, pub_date=timezone.now()).save()
+
+        with self.settings(POLLS_HOME_PAGE_SIZE=2):
+            response = self.client.get('/')
+            with self.assertNumQueries(1):
+                self.client.get('/?after=%s' % (response.context['next_cursor'],))
+
+    def test_home_page_rejects_malformed_cursors(self):
+        response = self.client.get('/?after=yesterday')
+
+        self.assertEquals(response.status_code, 404)
+
+    def test_home_page_query_is_backed_by_an_index(self):
+        cursor = connection.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' "
+                       "AND tbl_name = 'polls_poll'")
+        self.assertIn('polls_poll_pub_date_id', [row[0] for row in cursor.fetchall()])
+
 class SinglePollViewTest(TestCase):
 
     def test_page_shows_poll_title_and_no_votes_message(self):
@@ -104,6 +171,21 @@ class SinglePollViewTest(TestCase):
         self.assertIn('1 vote', response.content)
         self.assertNotIn('1 votes', response.content)
 
+    def test_query_count_does_not_depend_on_number_of_choices(self):
+        poll1 = Poll(question='few', pub_date=timezone.now())
+        poll1.save()
+        for i in range(2):
+            Choice(poll=poll1, choice='choice %d' % i, votes=i).save()
+        poll2 = Poll(question='many', pub_date=timezone.now())
+        poll2.save()
+        for i in range(20):
+            Choice(poll=poll2, choice='choice %d' % i, votes=i).save()
+
+        with self.assertNumQueries(2):
+            self.client.get('/poll/%d/' % (poll1.id,))
+        with self.assertNumQueries(2):
+            self.client.get('/poll/%d/' % (poll2.id,))
+
     def test_view_can_handle_votes_via_POST(self):
         poll1 = Poll(question='6 times 7', pub_date=timezone.now())
         poll1.save()
@@ -122,3 +204,52 @@ class SinglePollViewTest(TestCase):
         self.assertEquals(choice_in_db.votes, 4)
         self.assertRedirects(response, poll_url)
 
+    def test_view_rejects_votes_for_choices_of_another_poll(self):
+        poll1 = Poll(question='6 times 7', pub_date=timezone.now())
+        poll1.save()
+        poll2 = Poll(question='time', pub_date=timezone.now())
+        poll2.save()
+        choice1 = Choice(poll=poll1, choice="42", votes=1)
+        choice1.save()
+
+        response = self.client.post('/poll/%d/' % (poll2.id,),
+                data={ 'vote': str(choice1.id) })
+
+        self.assertEquals(response.status_code, 404)
+        self.assertEquals(Choice.objects.get(pk=choice1.id).votes, 1)
+
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.poll = Poll(question='6 times 7', pub_date=timezone.now())
+        self.poll.save()
+        self.choices = []
+        for i in range(10):
+            choice = Choice(poll=self.poll, choice='choice %d' % i, votes=i)
+            choice.save()
+            self.choices.append(choice)
+        for i in range(10):
+            Poll(question='poll %d' % i, pub_date=timezone.now()).save()
+        cache.clear()
+
+    def test_home_page_query_budget(self):
+        with self.assertMaxQueries(QUERY_BUDGETS['home']):
+            self.client.get('/')
+
+    def test_poll_page_query_budget(self):
+        with self.assertMaxQueries(QUERY_BUDGETS['poll']):
+            self.client.get('/poll/%d/' % (self.poll.id,))
+
+    def test_vote_query_budget(self):
+        with self.assertMaxQueries(QUERY_BUDGETS['vote']):
+            self.client.post('/poll/%d/' % (self.poll.id,),
+                    data={ 'vote': str(self.choices[3].id) })
+
+    def test_vote_validates_against_cached_choices(self):
+        self.client.get('/poll/%d/' % (self.poll.id,))
+
+        # Only record_vote()'s writes are left once the results are cached.
+        with self.assertNumQueries(3):
+            self.client.post('/poll/%d/' % (self.poll.id,),
+                    data={ 'vote': str(self.choices[3].id) })
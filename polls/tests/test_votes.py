@@ -0,0 +1,279 @@
+import datetime
+import threading
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from mock import patch
+from polls.models import Poll, Choice, VoteShard, VoteEvent, VoteBucket, RollupMark
+from polls.votes import record_vote, rollup_shards, rollup_events, find_vote_drift
+
+class RecordVoteTest(TestCase):
+
+    def setUp(self):
+        self.poll = Poll(question='6 times 7', pub_date=timezone.now())
+        self.poll.save()
+        self.choice = Choice(poll=self.poll, choice='42', votes=4)
+        self.choice.save()
+
+    def test_record_vote_increments_and_returns_new_count(self):
+        self.assertEquals(record_vote(self.poll, self.choice.id), 5)
+        self.assertEquals(record_vote(self.poll, self.choice.id, count=3), 8)
+
+        self.assertEquals(Choice.objects.get(pk=self.choice.id).votes, 8)
+
+    def test_record_vote_updates_the_choice_and_the_poll_total(self):
+        with self.assertNumQueries(3):
+            record_vote(self.poll, self.choice.id, count=2)
+
+        self.assertEquals(Poll.objects.get(pk=self.poll.id).votes, 6)
+
+    def test_record_vote_adds_to_the_minute_hour_and_day_buckets(self):
+        when = datetime.datetime(2013, 5, 1, 9, 41, 7, tzinfo=timezone.utc)
+        with patch('polls.votes.timezone.now', return_value=when):
+            record_vote(self.poll, self.choice.id, count=2)
+            record_vote(self.poll, self.choice.id)
+
+        buckets = VoteBucket.objects.filter(choice=self.choice) \
+                .order_by('start').values_list('resolution', 'start', 'votes')
+        self.assertEquals(list(buckets), [
+            (VoteBucket.DAY, datetime.datetime(2013, 5, 1, tzinfo=timezone.utc), 3),
+            (VoteBucket.HOUR, datetime.datetime(2013, 5, 1, 9, tzinfo=timezone.utc), 3),
+            (VoteBucket.MINUTE, datetime.datetime(2013, 5, 1, 9, 41, tzinfo=timezone.utc), 3),
+        ])
+
+    @patch('polls.votes._supports_upsert', return_value=False)
+    def test_buckets_without_upsert_support(self, supports_upsert):
+        record_vote(self.poll, self.choice.id, count=2)
+        record_vote(self.poll, self.choice.id)
+
+        self.assertEquals(list(VoteBucket.objects.filter(choice=self.choice)
+                .values_list('votes', flat=True)), [3, 3, 3])
+
+    def test_record_vote_rejects_choices_of_other_polls(self):
+        other_poll = Poll(question='time', pub_date=timezone.now())
+        other_poll.save()
+
+        self.assertRaises(Choice.DoesNotExist,
+                record_vote, other_poll, self.choice.id)
+        self.assertEquals(Choice.objects.get(pk=self.choice.id).votes, 4)
+
+class ShardedVotesTest(TestCase):
+
+    def setUp(self):
+        self.poll = Poll(question='6 times 7', pub_date=timezone.now(),
+                vote_mode=Poll.SHARDED_VOTES)
+        self.poll.save()
+        self.choice1 = Choice(poll=self.poll, choice='42', votes=2)
+        self.choice1.save()
+        self.choice2 = Choice(poll=self.poll, choice='The ultimate answer', votes=0)
+        self.choice2.save()
+
+    def test_sharded_votes_go_to_shard_rows(self):
+        for _ in range(10):
+            record_vote(self.poll, self.choice1.id)
+        self.assertEquals(record_vote(self.poll, self.choice2.id, count=3), 3)
+
+        self.assertEquals(Choice.objects.get(pk=self.choice1.id).votes, 2)
+        shard_votes = VoteShard.objects.filter(choice=self.choice1) \
+                .values_list('votes', flat=True)
+        self.assertEquals(sum(shard_votes), 10)
+
+    def test_reads_include_votes_that_are_not_rolled_up(self):
+        for _ in range(4):
+            record_vote(self.poll, self.choice1.id)
+        record_vote(self.poll, self.choice2.id, count=2)
+
+        poll = Poll.objects.get(pk=self.poll.id)
+        self.assertEquals(poll.total_votes(), 8)
+        choice1 = Choice.objects.get(pk=self.choice1.id)
+        self.assertEquals(choice1.vote_count(), 6)
+        self.assertEquals(choice1.percentage(), 75)
+
+        results = poll.results()
+        self.assertEquals(results.total_votes, 8)
+        self.assertEquals([c.votes for c in results.choices], [6, 2])
+
+    def test_rollup_moves_shard_votes_into_choices(self):
+        for _ in range(5):
+            record_vote(self.poll, self.choice1.id)
+
+        self.assertEquals(rollup_shards(), 5)
+
+        self.assertEquals(Choice.objects.get(pk=self.choice1.id).votes, 7)
+        poll = Poll.objects.get(pk=self.poll.id)
+        self.assertEquals(poll.votes, 7)
+        self.assertEquals(poll.total_votes(), 7)
+        self.assertEquals(rollup_shards(), 0)
+
+    def test_buckets_are_filled_by_the_rollup(self):
+        record_vote(self.poll, self.choice1.id, count=2)
+        self.assertEquals(VoteBucket.objects.count(), 0)
+
+        when = datetime.datetime(2013, 5, 1, 9, 41, 7, tzinfo=timezone.utc)
+        with patch('polls.votes.timezone.now', return_value=when):
+            rollup_shards()
+
+        buckets = VoteBucket.objects.filter(choice=self.choice1) \
+                .order_by('start').values_list('start', 'votes')
+        self.assertEquals(list(buckets), [
+            (datetime.datetime(2013, 5, 1, tzinfo=timezone.utc), 2),
+            (datetime.datetime(2013, 5, 1, 9, tzinfo=timezone.utc), 2),
+            (datetime.datetime(2013, 5, 1, 9, 41, tzinfo=timezone.utc), 2),
+        ])
+
+    def test_rollup_votes_command(self):
+        record_vote(self.poll, self.choice2.id)
+
+        call_command('rollup_votes', verbosity=0)
+
+        self.assertEquals(Choice.objects.get(pk=self.choice2.id).votes, 1)
+
+    def test_sharded_votes_reject_choices_of_other_polls(self):
+        other_poll = Poll(question='time', pub_date=timezone.now(),
+                vote_mode=Poll.SHARDED_VOTES)
+        other_poll.save()
+
+        self.assertRaises(Choice.DoesNotExist,
+                record_vote, other_poll, self.choice1.id)
+        self.assertEquals(VoteShard.objects.count(), 0)
+
+class EventLogVotesTest(TestCase):
+
+    def setUp(self):
+        self.poll = Poll(question='6 times 7', pub_date=timezone.now(),
+                vote_mode=Poll.EVENT_VOTES)
+        self.poll.save()
+        self.choice1 = Choice(poll=self.poll, choice='42', votes=2)
+        self.choice1.save()
+        self.choice2 = Choice(poll=self.poll, choice='The ultimate answer', votes=0)
+        self.choice2.save()
+
+    def test_votes_are_appended_as_events(self):
+        with self.assertNumQueries(2):
+            self.assertEquals(record_vote(self.poll, self.choice1.id), 3)
+        self.assertEquals(record_vote(self.poll, self.choice1.id, count=2), 5)
+
+        self.assertEquals(Choice.objects.get(pk=self.choice1.id).votes, 2)
+        self.assertEquals(VoteEvent.objects.filter(choice=self.choice1,
+                poll=self.poll).count(), 3)
+
+    def test_reads_include_events_that_are_not_rolled_up(self):
+        record_vote(self.poll, self.choice1.id, count=4)
+        record_vote(self.poll, self.choice2.id, count=2)
+
+        poll = Poll.objects.get(pk=self.poll.id)
+        self.assertEquals(poll.total_votes(), 8)
+        self.assertEquals(Choice.objects.get(pk=self.choice1.id).vote_count(), 6)
+        self.assertEquals([c.votes for c in poll.results().choices], [6, 2])
+
+    def test_rollup_folds_events_past_the_high_water_mark(self):
+        record_vote(self.poll, self.choice1.id, count=3)
+        record_vote(self.poll, self.choice2.id, count=2)
+
+        self.assertEquals(rollup_events(batch_size=2, settle_seconds=0), 5)
+
+        self.assertEquals(Choice.objects.get(pk=self.choice1.id).votes, 5)
+        self.assertEquals(Choice.objects.get(pk=self.choice2.id).votes, 2)
+        poll = Poll.objects.get(pk=self.poll.id)
+        self.assertEquals(poll.votes, 7)
+        self.assertEquals(poll.total_votes(), 7)
+        self.assertEquals(VoteEvent.objects.count(), 5)
+        self.assertEquals(RollupMark.objects.get(name=RollupMark.VOTE_EVENTS).last_id,
+                VoteEvent.objects.order_by('-id')[0].id)
+
+        record_vote(self.poll, self.choice2.id)
+        self.assertEquals(rollup_events(settle_seconds=0), 1)
+        self.assertEquals(rollup_events(settle_seconds=0), 0)
+        self.assertEquals(Poll.objects.get(pk=self.poll.id).total_votes(), 8)
+
+    def test_rollup_fills_the_buckets_of_the_events_times(self):
+        first = datetime.datetime(2013, 5, 1, 9, 41, 7, tzinfo=timezone.utc)
+        for when, choice, count in [(first, self.choice1, 2),
+                                    (first + datetime.timedelta(minutes=1), self.choice1, 1),
+                                    (first + datetime.timedelta(hours=1), self.choice2, 1)]:
+            with patch('polls.votes.timezone.now', return_value=when):
+                record_vote(self.poll, choice.id, count)
+        self.assertEquals(VoteBucket.objects.count(), 0)
+
+        rollup_events(batch_size=2, settle_seconds=0)
+
+        buckets = VoteBucket.objects.filter(resolution=VoteBucket.MINUTE) \
+                .order_by('start').values_list('choice', 'start', 'votes')
+        self.assertEquals(list(buckets), [
+            (self.choice1.id, datetime.datetime(2013, 5, 1, 9, 41, tzinfo=timezone.utc), 2),
+            (self.choice1.id, datetime.datetime(2013, 5, 1, 9, 42, tzinfo=timezone.utc), 1),
+            (self.choice2.id, datetime.datetime(2013, 5, 1, 10, 41, tzinfo=timezone.utc), 1),
+        ])
+        self.assertEquals(VoteBucket.objects.get(choice=self.choice1,
+                resolution=VoteBucket.HOUR).votes, 3)
+        self.assertEquals(Choice.objects.get(pk=self.choice1.id).votes, 5)
+
+    def test_rollup_leaves_recent_events_alone(self):
+        record_vote(self.poll, self.choice1.id)
+
+        self.assertEquals(rollup_events(settle_seconds=60), 0)
+        self.assertEquals(Poll.objects.get(pk=self.poll.id).total_votes(), 3)
+
+    def test_event_votes_reject_choices_of_other_polls(self):
+        other_poll = Poll(question='time', pub_date=timezone.now(),
+                vote_mode=Poll.EVENT_VOTES)
+        other_poll.save()
+
+        self.assertRaises(Choice.DoesNotExist,
+                record_vote, other_poll, self.choice1.id)
+        self.assertEquals(VoteEvent.objects.count(), 0)
+
+class ReconcileVotesTest(TestCase):
+
+    def test_reconcile_votes_fixes_drifted_totals(self):
+        poll1 = Poll(question='6 times 7', pub_date=timezone.now())
+        poll1.save()
+        Choice(poll=poll1, choice='42', votes=3).save()
+        poll2 = Poll(question='time', pub_date=timezone.now())
+        poll2.save()
+        Choice(poll=poll2, choice='PM', votes=1).save()
+        Poll.objects.filter(pk=poll1.id).update(votes=10)
+
+        self.assertEquals(list(find_vote_drift()), [(poll1.id, 10, 3)])
+
+        call_command('reconcile_votes', dry_run=True, verbosity=0)
+        self.assertEquals(Poll.objects.get(pk=poll1.id).votes, 10)
+
+        call_command('reconcile_votes', verbosity=0)
+        self.assertEquals(Poll.objects.get(pk=poll1.id).votes, 3)
+        self.assertEquals(Poll.objects.get(pk=poll2.id).votes, 1)
+        self.assertEquals(list(find_vote_drift()), [])
+
+class RecordVoteConcurrencyTest(TransactionTestCase):
+
+    def test_parallel_votes_are_not_lost(self):
+        poll = Poll(question='6 times 7', pub_date=timezone.now())
+        poll.save()
+        choice = Choice(poll=poll, choice='42', votes=0)
+        choice.save()
+
+        threads_count, votes_per_thread = 8, 25
+        returned, errors = [], []
+
+        def vote():
+            try:
+                for _ in range(votes_per_thread):
+                    returned.append(record_vote(poll, choice.id))
+            except Exception, e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=vote) for _ in range(threads_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEquals(errors, [])
+        total = threads_count * votes_per_thread
+        self.assertEquals(Choice.objects.get(pk=choice.id).votes, total)
+        self.assertEquals(sorted(returned), range(1, total + 1))
+        self.assertEquals(Poll.objects.get(pk=poll.id).votes, total)
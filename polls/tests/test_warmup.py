@@ -0,0 +1,76 @@
+from StringIO import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from mock import patch
+from polls.models import Poll, Choice
+from polls.warmup import hot_polls, warm_caches
+
+class WarmCachesTest(TestCase):
+
+    def setUp(self):
+        self.polls = []
+        for votes in [5, 1, 3]:
+            poll = Poll(question='%d votes' % votes, pub_date=timezone.now())
+            poll.save()
+            Choice(poll=poll, choice='yes', votes=votes).save()
+            self.polls.append(poll)
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_trending_polls_come_before_most_voted_ones(self):
+        Poll.objects.filter(pk=self.polls[1].pk).update(trending=1.0)
+
+        self.assertEquals(hot_polls(2), [self.polls[1].id, self.polls[0].id])
+        self.assertEquals(hot_polls(5), [self.polls[1].id, self.polls[0].id, self.polls[2].id])
+
+    def test_warmed_poll_pages_do_not_hit_the_database(self):
+        report = warm_caches(limit=2, batch_size=1, workers=1)
+
+        self.assertEquals(report['selected'], 2)
+        self.assertEquals(report['warmed'], 2)
+        self.assertEquals(report['vote_coverage'], 8 / 9.0)
+        with self.assertNumQueries(0):
+            response = self.client.get('/poll/%d/' % (self.polls[0].id,))
+        self.assertIn('5 votes', response.content)
+        with self.assertNumQueries(2):
+            self.client.get('/poll/%d/' % (self.polls[1].id,))
+
+    def test_votes_invalidate_warmed_results(self):
+        warm_caches(limit=3, workers=1)
+        choice = Choice.objects.get(poll=self.polls[0])
+        self.client.post('/poll/%d/' % (self.polls[0].id,), data={'vote': str(choice.id)})
+
+        response = self.client.get('/poll/%d/' % (self.polls[0].id,))
+        self.assertIn('6 votes', response.content)
+
+    @patch('polls.warmup.time')
+    def test_batches_are_skipped_once_the_budget_is_spent(self, time):
+        time.time.side_effect = [0, 0, 100, 100]
+
+        report = warm_caches(limit=3, batch_size=2, workers=1, budget=10)
+
+        self.assertEquals(report['selected'], 3)
+        self.assertEquals(report['warmed'], 2)
+        self.assertEquals(report['seconds'], 100)
+
+    def test_command_reports_coverage(self):
+        output = StringIO()
+        # Only the backend's name is checked: the cache in use stays the same.
+        with self.settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache'}}):
+            call_command('warm_caches', polls=1, workers=1, stdout=output)
+
+        self.assertEquals(output.getvalue().split(' in ')[0],
+                'Warmed 1 of 1 polls (56% of votes)')
+
+    def test_command_refuses_a_per_process_cache(self):
+        errors = StringIO()
+        # call_command() reports a CommandError and exits.
+        self.assertRaises(SystemExit, call_command, 'warm_caches', stdout=StringIO(),
+                          stderr=errors)
+        self.assertIn('local-memory cache is per process', errors.getvalue())
@@ -0,0 +1,78 @@
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase
+from django.utils import timezone
+from polls.bench import VoteClient
+from polls.models import Poll, Choice
+from polls.wsgi import VoteHandler, vote_dispatcher
+
+class VoteEndpointTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.poll = Poll(question='6 times 7', pub_date=timezone.now())
+        self.poll.save()
+        self.choice = Choice(poll=self.poll, choice='42', votes=1)
+        self.choice.save()
+        self.url = '/poll/%d/vote/' % (self.poll.id,)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_vote_endpoint_records_the_vote_and_answers_with_json(self):
+        for client in [self.client, VoteClient()]:
+            response = client.post(self.url, { 'vote': str(self.choice.id) })
+
+            self.assertEquals(response.status_code, 200)
+            data = json.loads(response.content)
+            self.assertEquals((data['poll'], data['choice']), (self.poll.id, self.choice.id))
+        self.assertEquals(Choice.objects.get(pk=self.choice.id).votes, 3)
+
+    def test_vote_endpoint_rejects_bad_votes(self):
+        other = Poll(question='time', pub_date=timezone.now())
+        other.save()
+        other_choice = Choice(poll=other, choice='PM', votes=0)
+        other_choice.save()
+
+        for data in [{}, { 'vote': 'x' }, { 'vote': str(other_choice.id) }]:
+            self.assertEquals(VoteClient().post(self.url, data).status_code, 400)
+        self.assertEquals(VoteClient().get(self.url).status_code, 405)
+        self.assertEquals(VoteClient().post('/poll/%d/vote/' % (other.id + 1,),
+                { 'vote': str(self.choice.id) }).status_code, 404)
+
+    def test_vote_profile_skips_sessions_but_keeps_csrf(self):
+        client = VoteClient(enforce_csrf_checks=True)
+        response = client.post(self.url, { 'vote': str(self.choice.id) })
+
+        self.assertEquals(response.status_code, 403)
+        handler = client.handler
+        middleware = set(method.im_class.__name__ for method in
+                handler._request_middleware + handler._view_middleware + handler._response_middleware)
+        self.assertEquals(middleware, set(['RequestMetricsMiddleware', 'PinPrimaryMiddleware',
+                                           'CsrfViewMiddleware']))
+        self.assertEquals(Choice.objects.get(pk=self.choice.id).votes, 1)
+
+    def test_vote_middleware_is_loaded_without_touching_settings(self):
+        with self.settings(MIDDLEWARE_CLASSES=('no.such.Middleware',)):
+            handler = VoteHandler()
+            handler.load_middleware()
+            self.assertEquals(settings.MIDDLEWARE_CLASSES, ('no.such.Middleware',))
+
+        self.assertEquals([method.im_class.__name__ for method in handler._request_middleware],
+                          ['RequestMetricsMiddleware', 'PinPrimaryMiddleware'])
+        with self.settings(POLLS_VOTE_MIDDLEWARE_CLASSES=('no.such.Middleware',)):
+            self.assertRaises(ImproperlyConfigured, VoteHandler().load_middleware)
+
+    def test_dispatcher_sends_vote_posts_to_the_vote_application(self):
+        application = vote_dispatcher(lambda environ, start_response: 'site',
+                lambda environ, start_response: 'votes')
+
+        self.assertEquals(application({'REQUEST_METHOD': 'POST',
+                'PATH_INFO': self.url}, None), 'votes')
+        self.assertEquals(application({'REQUEST_METHOD': 'GET',
+                'PATH_INFO': self.url}, None), 'site')
+        self.assertEquals(application({'REQUEST_METHOD': 'POST',
+                'PATH_INFO': '/poll/%d/' % self.poll.id}, None), 'site')
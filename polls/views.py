@@ -1,20 +1,360 @@
-from django.shortcuts import render
-from polls.models import Poll, Choice
+import datetime
+import hashlib
+import json
+import math
+import pstats
+import time
+
+from django.conf import settings
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from polls.models import Poll, Choice, VoteBucket, results_for_polls, votes_before
 from polls.forms import PollVoteForm
+from polls.votes import record_vote
+from polls.buffer import vote_buffer
+from polls.routers import use_primary
+from polls.search import search_polls
+from polls.leaderboard import current_period, leaderboards
+from polls.cache import get_results, cached_results, results_version, home_version, \
+        versions_shared
+from polls.export import FORMATS, export_rows
+from polls.profiling import profiles
+from django.contrib.admin.views.decorators import staff_member_required
 from django.core.urlresolvers import reverse
-from django.http import HttpResponseRedirect
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseRedirect, Http404
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_POST
+from django.views.decorators.vary import vary_on_cookie
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def _encode_cursor(poll):
+    delta = poll.pub_date - EPOCH
+    microseconds = (delta.days * 86400 + delta.seconds) * 10 ** 6 + delta.microseconds
+    return '%d-%d' % (microseconds, poll.id)
+
+def _decode_cursor(cursor):
+    # Polls from before 1970 have a negative timestamp.
+    microseconds, poll_id = cursor.rsplit('-', 1)
+    pub_date = EPOCH + datetime.timedelta(microseconds=int(microseconds))
+    return pub_date, int(poll_id)
+
+def _etag(*parts):
+    return hashlib.md5(':'.join(str(part) for part in parts)).hexdigest()
 
+def _home_etag(request):
+    if request.method not in ('GET', 'HEAD') or not versions_shared():
+        return None
+    after = request.GET.get('after', '')
+    # The first page lists the leaderboards, which change every period.
+    period = '' if after else current_period()
+    return _etag('home', home_version(), after, period)
+
+def _poll_etag(request, poll_id):
+    # The page embeds the CSRF token, so a client without the cookie is
+    # about to get a different page.
+    csrf_token = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+    if request.method not in ('GET', 'HEAD') or not csrf_token or not versions_shared():
+        return None
+    return _etag('poll', poll_id, results_version(poll_id), csrf_token)
+
+@cache_control(public=True, max_age=0, must_revalidate=True)
+@condition(etag_func=_home_etag)
 def home(request):
-    context = { 'polls': Poll.objects.all() }
-    return render(request, 'home.html', context)
+    polls = Poll.objects.order_by('pub_date', 'id').only('id', 'question', 'pub_date')
+    if 'after' in request.GET:
+        try:
+            pub_date, poll_id = _decode_cursor(request.GET['after'])
+        except (ValueError, OverflowError):
+            raise Http404
+        polls = polls.filter(pub_date__gte=pub_date) \
+                .exclude(pub_date=pub_date, id__lte=poll_id)
+
+    # The ETag's home version is bumped as soon as a poll is saved, so the
+    # page must not come from a replica that has not seen the poll yet.
+    page_size = settings.POLLS_HOME_PAGE_SIZE
+    with use_primary():
+        polls = list(polls[:page_size + 1])
+    next_cursor = None
+    if len(polls) > page_size:
+        polls = polls[:page_size]
+        next_cursor = _encode_cursor(polls[-1])
+
+    context = { 'polls': polls, 'next_cursor': next_cursor }
+    if 'after' not in request.GET:
+        with use_primary():
+            (context['top_polls'], context['trending_polls']), _ = leaderboards()
+    return TemplateResponse(request, 'home.html', context)
 
+def _vote(poll, choice_id):
+    # Buffered votes must have been checked against the poll's choices.
+    if vote_buffer.enabled:
+        vote_buffer.add(poll.id, choice_id)
+    else:
+        record_vote(poll, choice_id)
+
+def _poll_and_results(poll_id):
+    # Results are cached until the next vote, so they must not come from a
+    # replica that has not seen the last one yet.
+    def build():
+        with use_primary():
+            poll = get_object_or_404(Poll, pk=poll_id)
+            return poll, poll.results()
+    return get_results(poll_id, build)
+
+@cache_control(private=True, max_age=0, must_revalidate=True)
+@vary_on_cookie
+@condition(etag_func=_poll_etag)
 def poll(request, poll_id):
+    poll, results = _poll_and_results(poll_id)
+
     if request.method == 'POST':
-        choice = Choice.objects.get(id=request.POST['vote'])
-        choice.votes += 1
-        choice.save()
+        form = PollVoteForm(poll=poll, choices=results.choices, data=request.POST)
+        if not form.is_valid():
+            raise Http404
+        try:
+            _vote(poll, form.cleaned_data['vote'])
+        except Choice.DoesNotExist:
+            raise Http404
         return HttpResponseRedirect(reverse('polls.views.poll', args=[poll_id,]))
 
-    poll = Poll.objects.get(pk=poll_id)
-    form = PollVoteForm(poll=poll)
-    return render(request, 'poll.html', { 'poll': poll, 'form': form })
+    form = PollVoteForm(poll=poll, choices=results.choices)
+    context = { 'poll': poll, 'results': results, 'form': form }
+    return TemplateResponse(request, 'poll.html', context)
+
+@require_POST
+def vote(request, poll_id):
+    """
+    Records a vote and answers with a small JSON document rather than a
+    redirect to the poll page. Its ``version`` can be passed on to
+    api_poll_changes.
+
+    Every vote changes the poll's results, so they are not loaded here:
+    record_vote() checks that the choice belongs to the poll.
+    """
+    poll = get_object_or_404(Poll.objects.only('id', 'vote_mode'), pk=poll_id)
+    try:
+        choice_id = int(request.POST['vote'])
+        if vote_buffer.enabled and not poll.choice_set.filter(pk=choice_id).exists():
+            raise Choice.DoesNotExist
+        _vote(poll, choice_id)
+    except (KeyError, ValueError, Choice.DoesNotExist):
+        return HttpResponseBadRequest('vote must be one of the poll\'s choices')
+    return _json_response({
+        'poll': poll.id,
+        'choice': choice_id,
+        'version': results_version(poll.id),
+    })
+
+def _results_json(poll_id, question, results):
+    return {
+        'id': poll_id,
+        'question': question,
+        'total_votes': results.total_votes,
+        'choices': [c._asdict() for c in results.choices],
+    }
+
+def _json_response(data):
+    return HttpResponse(json.dumps(data), mimetype='application/json')
+
+def api_polls(request):
+    try:
+        poll_ids = [int(i) for i in request.GET.get('ids', '').split(',') if i]
+    except ValueError:
+        return HttpResponseBadRequest('ids must be a comma separated list of poll ids')
+    if len(poll_ids) > settings.POLLS_API_MAX_IDS:
+        return HttpResponseBadRequest('at most %d polls per request' % settings.POLLS_API_MAX_IDS)
+
+    results = results_for_polls(poll_ids)
+    polls = [_results_json(poll_id, *results[poll_id])
+             for poll_id in poll_ids if poll_id in results]
+    return _json_response({ 'polls': polls })
+
+def api_poll(request, poll_id):
+    results = results_for_polls([int(poll_id)])
+    if not results:
+        raise Http404
+    return _json_response(_results_json(int(poll_id), *results[int(poll_id)]))
+
+def _changed_choices(poll_id, version, results):
+    seen = cached_results(poll_id, version)
+    if seen is None:
+        return results.choices
+    seen = dict((c.id, c) for c in seen[1].choices)
+    # Percentages move with every vote, so only counts are compared.
+    return [c for c in results.choices if c.id not in seen or seen[c.id].votes != c.votes]
+
+def api_poll_changes(request, poll_id):
+    """
+    Long-polls a poll's results. The response comes as soon as the results
+    version differs from the ``version`` the client last saw, with the new
+    version and the choices whose counts changed since then, or as an
+    empty 204 once ``timeout`` seconds have passed without a vote.
+
+    Waiting only reads the version counter from the cache. Without shared
+    versions (see polls.cache.versions_shared) it answers straight away
+    with every choice.
+    """
+    try:
+        version = int(request.GET['version']) if 'version' in request.GET else None
+        timeout = min(float(request.GET.get('timeout', settings.POLLS_LIVE_TIMEOUT)),
+                      settings.POLLS_LIVE_TIMEOUT)
+        if math.isnan(timeout) or math.isinf(timeout):
+            raise ValueError
+    except ValueError:
+        return HttpResponseBadRequest('version and timeout must be numbers')
+    poll_id = int(poll_id)
+    if not versions_shared():
+        version = None
+
+    current = results_version(poll_id)
+    interval = settings.POLLS_LIVE_INTERVAL_MS / 1000.0
+    for _ in range(int(max(timeout, 0) / interval)):
+        if current != version:
+            break
+        time.sleep(interval)
+        current = results_version(poll_id)
+    if current == version:
+        return HttpResponse(status=204)
+
+    poll, results = _poll_and_results(poll_id)
+    choices = results.choices if version is None else \
+            _changed_choices(poll_id, version, results)
+    return _json_response({
+        'id': poll_id,
+        # The results are at least as recent as this version, so a vote in
+        # between is sent again rather than missed.
+        'version': current,
+        'total_votes': results.total_votes,
+        'choices': [c._asdict() for c in choices],
+    })
+
+def _parse_time(value):
+    when = parse_datetime(value)
+    if when is None:
+        raise ValueError('invalid date and time %r' % (value,))
+    if timezone.is_naive(when):
+        when = timezone.make_aware(when, timezone.get_default_timezone())
+    return when
+
+def api_poll_history(request, poll_id):
+    """
+    Returns the votes each choice of a poll received per minute, hour or
+    day between ``since`` and ``until``, along with each choice's
+    percentage of the votes recorded up to the end of every bucket.
+
+    The series is read from the VoteBucket rows, so its cost depends on the
+    number of buckets and not on the number of votes. Votes recorded before
+    the buckets existed, or imported, are not part of it, and those of
+    sharded and event log polls only once they are rolled up.
+    """
+    resolution = request.GET.get('resolution', VoteBucket.HOUR)
+    if resolution not in VoteBucket.STEPS:
+        return HttpResponseBadRequest('resolution must be one of %s' %
+                ', '.join(r for r, _ in VoteBucket.RESOLUTIONS))
+    step = VoteBucket.STEPS[resolution]
+    try:
+        until = _parse_time(request.GET['until']) if 'until' in request.GET else timezone.now()
+        since = _parse_time(request.GET['since']) if 'since' in request.GET \
+                else until - step * settings.POLLS_HISTORY_DEFAULT_BUCKETS
+    except ValueError, e:
+        return HttpResponseBadRequest(str(e))
+    since = VoteBucket.floor(resolution, since)
+    if since >= until:
+        return HttpResponseBadRequest('since must be before until')
+    if (until - since) > step * settings.POLLS_HISTORY_MAX_BUCKETS:
+        return HttpResponseBadRequest('at most %d buckets per request' %
+                settings.POLLS_HISTORY_MAX_BUCKETS)
+
+    poll, results = _poll_and_results(poll_id)
+    choice_ids = [c.id for c in results.choices]
+    buckets = VoteBucket.objects.filter(choice__in=choice_ids, resolution=resolution,
+            start__gte=since, start__lt=until).values_list('start', 'choice', 'votes')
+    votes = {}
+    for start, choice_id, count in buckets:
+        votes.setdefault(start, {})[choice_id] = count
+
+    series, totals = [], votes_before(choice_ids, since)
+    for choice_id in choice_ids:
+        totals.setdefault(choice_id, 0)
+    start = since
+    while start < until:
+        counts = votes.get(start, {})
+        for choice_id, count in counts.items():
+            totals[choice_id] += count
+        total = sum(totals.values())
+        series.append({
+            'start': start.isoformat(),
+            'votes': [counts.get(choice_id, 0) for choice_id in choice_ids],
+            'percentages': [100.0 * totals[choice_id] / total if total else 0
+                            for choice_id in choice_ids],
+        })
+        start += step
+
+    return _json_response({
+        'id': poll.id,
+        'resolution': resolution,
+        'choices': [{'id': c.id, 'choice': c.choice} for c in results.choices],
+        'series': series,
+    })
+
+def api_search(request):
+    """
+    Returns the polls matching the words of ``q`` in their question or
+    choices, ranked, POLLS_SEARCH_PAGE_SIZE per ``page``.
+    """
+    query = request.GET.get('q', '').strip()
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        page = 0
+    if page < 1:
+        return HttpResponseBadRequest('page must be a positive number')
+
+    page_size = settings.POLLS_SEARCH_PAGE_SIZE
+    polls = search_polls(query, offset=(page - 1) * page_size, limit=page_size + 1)
+    return _json_response({
+        'q': query,
+        'page': page,
+        'next_page': page + 1 if len(polls) > page_size else None,
+        'polls': [{'id': poll_id, 'question': question}
+                  for poll_id, question in polls[:page_size]],
+    })
+
+@staff_member_required
+def export_polls(request, format):
+    lines, mimetype = FORMATS[format]
+    response = HttpResponse(lines(export_rows()), mimetype=mimetype)
+    response['Content-Disposition'] = 'attachment; filename=polls.%s' % (format,)
+    return response
+
+@staff_member_required
+def profile_index(request):
+    lines = ['%s\t%d samples\t%s\n' % (view, samples, reverse(profile_report, args=[view]))
+             for view, samples in profiles.views()]
+    return HttpResponse(lines, mimetype='text/plain')
+
+@staff_member_required
+def profile_report(request, view):
+    sort = request.GET.get('sort', 'cumulative')
+    if sort not in pstats.Stats.sort_arg_dict_default:
+        return HttpResponseBadRequest('Unknown sort key: %s' % (sort,))
+    try:
+        limit = max(1, int(request.GET.get('n', 30)))
+    except ValueError:
+        return HttpResponseBadRequest('n must be a number')
+    report = profiles.report(view, limit=limit, sort=sort)
+    if report is None:
+        raise Http404
+    return HttpResponse(report, mimetype='text/plain')
+
+@staff_member_required
+def profile_dump(request, view):
+    dump = profiles.dump(view)
+    if dump is None:
+        raise Http404
+    response = HttpResponse(dump, mimetype='application/octet-stream')
+    response['Content-Disposition'] = 'attachment; filename=%s.pstats' % (view,)
+    return response
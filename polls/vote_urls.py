@@ -0,0 +1,7 @@
+from django.conf.urls import patterns, url
+
+# The URLconf of polls.wsgi.VoteHandler: only the vote endpoint, without the
+# admin and its autodiscovery.
+urlpatterns = patterns('',
+    url(r'^poll/(\d+)/vote/$', 'polls.views.vote'),
+)
@@ -0,0 +1,270 @@
+import datetime
+import random
+import sqlite3
+
+from django.conf import settings
+from django.db import connections, router, transaction, IntegrityError
+from django.db.models import Count, F, Max, Sum
+from django.utils import timezone
+from polls.cache import bump_results_version
+from polls.leaderboard import bump_poll
+from polls.models import Poll, Choice, VoteShard, VoteEvent, VoteBucket, RollupMark
+from polls.routers import use_primary
+
+def _supports_update_returning(connection):
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        return sqlite3.sqlite_version_info >= (3, 35, 0)
+    return False
+
+def _supports_upsert(connection):
+    if connection.vendor == 'postgresql':
+        return getattr(connection, 'pg_version', 0) >= 90500
+    if connection.vendor == 'sqlite':
+        return sqlite3.sqlite_version_info >= (3, 24, 0)
+    return False
+
+# Rows per bucket upsert, under SQLite's limit of 999 parameters.
+MAX_UPSERT_ROWS = 200
+
+def _bucket_counts(counts):
+    """
+    Turns (choice_id, when, votes) tuples into {(choice_id, resolution,
+    start): votes} for every bucket resolution.
+    """
+    buckets = {}
+    for choice_id, when, votes in counts:
+        for resolution, _ in VoteBucket.RESOLUTIONS:
+            key = (choice_id, resolution, VoteBucket.floor(resolution, when))
+            buckets[key] = buckets.get(key, 0) + votes
+    return buckets
+
+def _add_to_buckets(using, counts):
+    buckets = _bucket_counts(counts).items()
+    connection = connections[using]
+    if _supports_upsert(connection):
+        for first in range(0, len(buckets), MAX_UPSERT_ROWS):
+            rows = buckets[first:first + MAX_UPSERT_ROWS]
+            params = []
+            for (choice_id, resolution, start), votes in rows:
+                params += [choice_id, resolution, connection.ops.value_to_db_datetime(start), votes]
+            connection.cursor().execute(
+                'INSERT INTO %(table)s (choice_id, resolution, start, votes) VALUES %(rows)s '
+                'ON CONFLICT (choice_id, resolution, start) '
+                'DO UPDATE SET votes = %(table)s.votes + excluded.votes' % {
+                    'table': VoteBucket._meta.db_table,
+                    'rows': ', '.join(['(%s, %s, %s, %s)'] * len(rows)),
+                }, params)
+        transaction.set_dirty(using=using)
+        return
+
+    for (choice_id, resolution, start), votes in buckets:
+        rows = VoteBucket.objects.using(using).filter(
+                choice=choice_id, resolution=resolution, start=start)
+        if rows.update(votes=F('votes') + votes):
+            continue
+        sid = transaction.savepoint(using=using)
+        try:
+            rows.create(choice_id=choice_id, resolution=resolution,
+                        start=start, votes=votes)
+            transaction.savepoint_commit(sid, using=using)
+        except IntegrityError:
+            transaction.savepoint_rollback(sid, using=using)
+            rows.update(votes=F('votes') + votes)
+
+def _increment(using, poll_id, choice_id, count):
+    connection = connections[using]
+    if _supports_update_returning(connection):
+        cursor = connection.cursor()
+        cursor.execute(
+            'UPDATE %s SET votes = votes + %%s WHERE id = %%s AND poll_id = %%s '
+            'RETURNING votes' % Choice._meta.db_table,
+            [count, choice_id, poll_id])
+        rows = cursor.fetchall()
+        transaction.set_dirty(using=using)
+        if not rows:
+            return None
+        votes = rows[0][0]
+    else:
+        updated = Choice.objects.using(using).filter(
+                pk=choice_id, poll=poll_id).update(votes=F('votes') + count)
+        if not updated:
+            return None
+        votes = Choice.objects.using(using).filter(
+                pk=choice_id).values_list('votes', flat=True)[0]
+
+    bump_poll(using, poll_id, count, timezone.now())
+    return votes
+
+def _increment_shard(using, poll_id, choice_id, count):
+    counts = Choice.objects.using(using).filter(pk=choice_id, poll=poll_id) \
+            .annotate(pending=Sum('shards__votes')).values_list('votes', 'pending')
+    if not counts:
+        return None
+    votes, pending = counts[0]
+
+    shard = random.randrange(settings.POLLS_VOTE_SHARDS)
+    shards = VoteShard.objects.using(using).filter(choice=choice_id, shard=shard)
+    if not shards.update(votes=F('votes') + count):
+        sid = transaction.savepoint(using=using)
+        try:
+            shards.create(choice_id=choice_id, shard=shard, votes=count)
+            transaction.savepoint_commit(sid, using=using)
+        except IntegrityError:
+            # Another vote created this shard first.
+            transaction.savepoint_rollback(sid, using=using)
+            shards.update(votes=F('votes') + count)
+    return votes + (pending or 0) + count
+
+def _append_events(using, poll_id, choice_id, count):
+    condition, params = VoteEvent.objects.unrolled_condition()
+    pending = 'SELECT COUNT(*) FROM %s WHERE choice_id = %s.id AND %s' % (
+            VoteEvent._meta.db_table, Choice._meta.db_table, condition)
+    counts = Choice.objects.using(using).filter(pk=choice_id, poll=poll_id) \
+            .extra(select={'pending': pending}, select_params=params) \
+            .values_list('votes', 'pending')
+    if not counts:
+        return None
+    votes, pending = counts[0]
+
+    # Not bulk_create(): on SQLite it inserts with UNION SELECT, which
+    # drops identical rows.
+    connection = connections[using]
+    now = connection.ops.value_to_db_datetime(timezone.now())
+    connection.cursor().executemany(
+            'INSERT INTO %s (poll_id, choice_id, created_at) VALUES (%%s, %%s, %%s)'
+            % VoteEvent._meta.db_table, [(poll_id, choice_id, now)] * count)
+    transaction.set_dirty(using=using)
+    return votes + pending + count
+
+def record_vote(poll, choice_id, count=1):
+    """
+    Adds ``count`` votes to a choice of ``poll`` and returns the choice's
+    new number of votes.
+
+    Direct polls do this with a single conditional UPDATE of the choice,
+    followed by an UPDATE of the poll's stored total and trending score and
+    an upsert of the choice's current minute, hour and day VoteBucket in
+    the same transaction.
+    Sharded polls add the votes to one of POLLS_VOTE_SHARDS shard rows
+    picked at random, and the returned count does not include votes
+    recorded concurrently on other shards.
+    Event log polls insert one VoteEvent row per vote and never update a
+    row, which leaves nothing for concurrent votes to wait on.
+    The buckets of sharded and event log polls are only filled when their
+    votes are rolled up, as they would otherwise be rows every vote for a
+    choice waits on.
+
+    Raises Choice.DoesNotExist if the choice does not belong to the poll.
+    """
+    if poll.vote_mode == Poll.SHARDED_VOTES:
+        increment = _increment_shard
+    elif poll.vote_mode == Poll.EVENT_VOTES:
+        increment = _append_events
+    else:
+        increment = _increment
+
+    using = router.db_for_write(Choice)
+    with transaction.commit_on_success(using=using):
+        votes = increment(using, poll.id, choice_id, count)
+        if votes is not None and increment is _increment:
+            _add_to_buckets(using, [(choice_id, timezone.now(), count)])
+    if votes is None:
+        raise Choice.DoesNotExist(
+                'Choice %s does not belong to poll %s' % (choice_id, poll.id))
+    bump_results_version(poll.id)
+    return votes
+
+def rollup_shards():
+    """
+    Folds the votes accumulated in shard rows into Choice.votes, Poll.votes
+    and the vote buckets, and returns the number of votes moved. Shards do
+    not know when their votes were cast, so the buckets and the polls'
+    trending scores count them as cast now.
+    """
+    using = router.db_for_write(VoteShard)
+    shards = VoteShard.objects.using(using).filter(votes__gt=0) \
+            .values_list('id', 'choice', 'choice__poll', 'votes')
+    moved = 0
+    for shard_id, choice_id, poll_id, votes in shards.iterator():
+        with transaction.commit_on_success(using=using):
+            VoteShard.objects.using(using).filter(pk=shard_id) \
+                    .update(votes=F('votes') - votes)
+            Choice.objects.using(using).filter(pk=choice_id) \
+                    .update(votes=F('votes') + votes)
+            now = timezone.now()
+            bump_poll(using, poll_id, votes, now)
+            _add_to_buckets(using, [(choice_id, now, votes)])
+        moved += votes
+    return moved
+
+def rollup_events(batch_size=5000, settle_seconds=None):
+    """
+    Folds vote events past the rollup's high-water mark into Choice.votes,
+    Poll.votes and the vote buckets of the events' times, ``batch_size``
+    events per transaction, and returns the number of votes moved. The
+    polls' trending scores count them as cast now.
+
+    Only events older than ``settle_seconds`` are folded, so that an event
+    whose transaction commits after one with a higher id is not skipped.
+    Two rollups cannot fold the same events: the one that loses the race
+    to move the mark rolls back and stops.
+    """
+    if settle_seconds is None:
+        settle_seconds = settings.POLLS_VOTE_EVENT_SETTLE_SECONDS
+    using = router.db_for_write(VoteEvent)
+    settled = timezone.now() - datetime.timedelta(seconds=settle_seconds)
+    last_id = VoteEvent.objects.using(using).filter(created_at__lte=settled) \
+            .aggregate(Max('id'))['id__max']
+    if last_id is None:
+        return 0
+    RollupMark.objects.using(using).get_or_create(name=RollupMark.VOTE_EVENTS)
+
+    moved = 0
+    while True:
+        with transaction.commit_on_success(using=using):
+            mark = RollupMark.objects.using(using).get(name=RollupMark.VOTE_EVENTS)
+            if mark.last_id >= last_id:
+                return moved
+            upper = min(mark.last_id + batch_size, last_id)
+            counts = list(VoteEvent.objects.using(using)
+                    .filter(id__gt=mark.last_id, id__lte=upper)
+                    .values_list('poll', 'choice', 'created_at').annotate(Count('id')))
+            polls, choices = {}, {}
+            for poll_id, choice_id, created_at, votes in counts:
+                choices[choice_id] = choices.get(choice_id, 0) + votes
+                polls[poll_id] = polls.get(poll_id, 0) + votes
+            for choice_id, votes in choices.items():
+                Choice.objects.using(using).filter(pk=choice_id) \
+                        .update(votes=F('votes') + votes)
+            _add_to_buckets(using, [(choice_id, created_at, votes)
+                                    for _, choice_id, created_at, votes in counts])
+            for poll_id, votes in polls.items():
+                bump_poll(using, poll_id, votes, timezone.now())
+            if not RollupMark.objects.using(using).filter(
+                    pk=mark.pk, last_id=mark.last_id).update(last_id=upper):
+                transaction.rollback(using=using)
+                return moved
+        moved += sum(polls.values())
+
+def find_vote_drift(chunk_size=1000):
+    """
+    Yields (poll_id, stored, actual) for every poll whose stored Poll.votes
+    total differs from the sum of its choices' votes.
+    """
+    last_id = 0
+    while True:
+        # Drift found on a lagging replica may already be fixed, or not
+        # show up yet.
+        with use_primary():
+            polls = list(Poll.objects.filter(pk__gt=last_id).order_by('pk')
+                    .values_list('id', 'votes')[:chunk_size])
+            if not polls:
+                return
+            actual = dict(Choice.objects.filter(poll__in=[p for p, _ in polls])
+                    .values_list('poll').annotate(Sum('votes')))
+        last_id = polls[-1][0]
+        for poll_id, stored in polls:
+            if actual.get(poll_id, 0) != stored:
+                yield poll_id, stored, actual.get(poll_id, 0)
@@ -0,0 +1,83 @@
+import time
+from multiprocessing.pool import ThreadPool
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Sum
+from polls.cache import prefill_results
+from polls.leaderboard import leaderboards
+from polls.models import Poll, results_for_polls
+from polls.routers import use_primary
+
+def hot_polls(limit):
+    """
+    Returns the ids of up to ``limit`` polls to warm: the trending
+    leaderboard first, then the most voted polls.
+    """
+    with use_primary():
+        trending = list(Poll.objects.filter(trending__isnull=False)
+                .order_by('-trending', '-id')
+                .values_list('id', flat=True)[:min(limit, settings.POLLS_LEADERBOARD_SIZE)])
+        most_voted = list(Poll.objects.order_by('-votes', '-id')
+                .values_list('id', flat=True)[:limit])
+    poll_ids = []
+    for poll_id in trending + most_voted:
+        if poll_id not in poll_ids:
+            poll_ids.append(poll_id)
+    return poll_ids[:limit]
+
+def _build(poll_ids):
+    # The same (poll, results) pairs polls.views caches, from the primary.
+    with use_primary():
+        polls = Poll.objects.in_bulk(poll_ids)
+        results = results_for_polls(poll_ids)
+    return dict((poll_id, (polls[poll_id], results[poll_id][1]))
+                for poll_id in results if poll_id in polls)
+
+def warm_caches(limit=1000, batch_size=100, workers=4, budget=None):
+    """
+    Fills the leaderboards and the results cache of the hot_polls(limit)
+    in batches of ``batch_size`` polls, ``workers`` batches at a time.
+    Batches that have not started ``budget`` seconds in are skipped.
+
+    Returns a dict with the number of polls selected and warmed, the share
+    of all votes the warmed polls hold and the seconds taken.
+    """
+    started = time.time()
+    deadline = budget and started + budget
+    leaderboards()
+    poll_ids = hot_polls(limit)
+    batches = [poll_ids[start:start + batch_size]
+               for start in range(0, len(poll_ids), batch_size)]
+
+    def warm(batch):
+        if deadline and time.time() > deadline:
+            return {}
+        return dict((poll_id, poll.votes)
+                    for poll_id, (poll, _) in prefill_results(batch, _build).items())
+
+    def thread_warm(batch):
+        try:
+            return warm(batch)
+        finally:
+            connection.close()
+
+    if workers > 1 and len(batches) > 1:
+        pool = ThreadPool(workers)
+        try:
+            warmed = list(pool.imap_unordered(thread_warm, batches))
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        warmed = [warm(batch) for batch in batches]
+
+    # The warmed polls' totals come from the polls loaded to warm them.
+    covered = sum(sum(votes.values()) for votes in warmed)
+    total = Poll.objects.aggregate(votes=Sum('votes'))['votes'] or 0
+    return {
+        'selected': len(poll_ids),
+        'warmed': sum(len(votes) for votes in warmed),
+        'vote_coverage': float(covered) / total if total else 1.0,
+        'seconds': time.time() - started,
+    }
@@ -0,0 +1,68 @@
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.core.handlers.wsgi import WSGIHandler
+from django.utils.importlib import import_module
+
+VOTE_PATH = re.compile(r'^/poll/\d+/vote/$')
+
+class VoteHandlerMixin(object):
+    """
+    Runs requests through POLLS_VOTE_MIDDLEWARE_CLASSES and polls.vote_urls
+    instead of the site's whole middleware stack and URLconf.
+    """
+
+    def load_middleware(self):
+        # BaseHandler.load_middleware(), reading the middleware from
+        # POLLS_VOTE_MIDDLEWARE_CLASSES rather than MIDDLEWARE_CLASSES.
+        self._view_middleware = []
+        self._template_response_middleware = []
+        self._response_middleware = []
+        self._exception_middleware = []
+
+        request_middleware = []
+        for middleware_path in settings.POLLS_VOTE_MIDDLEWARE_CLASSES:
+            try:
+                mw_module, mw_classname = middleware_path.rsplit('.', 1)
+                mw_class = getattr(import_module(mw_module), mw_classname)
+            except (ValueError, ImportError, AttributeError), e:
+                raise ImproperlyConfigured('Error loading middleware %s: "%s"' % (middleware_path, e))
+            try:
+                mw_instance = mw_class()
+            except MiddlewareNotUsed:
+                continue
+
+            if hasattr(mw_instance, 'process_request'):
+                request_middleware.append(mw_instance.process_request)
+            if hasattr(mw_instance, 'process_view'):
+                self._view_middleware.append(mw_instance.process_view)
+            if hasattr(mw_instance, 'process_template_response'):
+                self._template_response_middleware.insert(0, mw_instance.process_template_response)
+            if hasattr(mw_instance, 'process_response'):
+                self._response_middleware.insert(0, mw_instance.process_response)
+            if hasattr(mw_instance, 'process_exception'):
+                self._exception_middleware.insert(0, mw_instance.process_exception)
+
+        # Assigned last: handlers take it as the sign loading is complete.
+        self._request_middleware = request_middleware
+
+    def get_response(self, request):
+        request.urlconf = 'polls.vote_urls'
+        return super(VoteHandlerMixin, self).get_response(request)
+
+class VoteHandler(VoteHandlerMixin, WSGIHandler):
+    pass
+
+def vote_dispatcher(application, vote_application=None):
+    """
+    Wraps a WSGI application so that vote POSTs are served by a VoteHandler.
+    """
+    vote_application = vote_application or VoteHandler()
+
+    def dispatch(environ, start_response):
+        if environ.get('REQUEST_METHOD') == 'POST' and \
+                VOTE_PATH.match(environ.get('PATH_INFO', '')):
+            return vote_application(environ, start_response)
+        return application(environ, start_response)
+    return dispatch
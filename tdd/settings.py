@@ -17,8 +17,36 @@ DATABASES = {
         'PASSWORD': '',                  # Not used with sqlite3.
         'HOST': '',                      # Set to empty string for localhost. Not used with sqlite3.
         'PORT': '',                      # Set to empty string for default. Not used with sqlite3.
+        # A file (rather than in-memory) test database lets concurrency tests
+        # open one real connection per thread.
+        'TEST_NAME': 'test_db.sqlite3',
+    },
+    # Read-only copy of the default database. Reads of polls models only go
+    # there when it is listed in POLLS_DATABASE_REPLICAS. To try it locally,
+    # copy db.sqlite3 to db-replica.sqlite3: votes will not show up in the
+    # copy, like on a replica that lags behind.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': 'db-replica.sqlite3',
+        'TEST_NAME': 'test_db_replica.sqlite3',
+    },
+}
+
+DATABASE_ROUTERS = ['polls.routers.PrimaryReplicaRouter']
+
+# Votes invalidate cached results, ETags and live results by bumping
+# version counters kept in the cache, so every process (web servers and
+# management commands alike) must share it, e.g. memcached. The local-memory
+# cache is per process: a vote in one would leave the others serving stale
+# results, so with it poll results are not cached, pages get no ETag and
+# live results are not long-polled, unless POLLS_ALLOW_LOCAL_CACHE says a
+# single process serves the site, as with runserver.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+POLLS_ALLOW_LOCAL_CACHE = DEBUG
 
 # Local time zone for this installation. Choices can be found here:
 # http://en.wikipedia.org/wiki/List_of_tz_zones_by_name
@@ -91,10 +119,13 @@ TEMPLATE_LOADERS = (
 )
 
 MIDDLEWARE_CLASSES = (
+    'polls.middleware.RequestMetricsMiddleware',
+    'polls.middleware.PinPrimaryMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'polls.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     # Uncomment the next line for simple clickjacking protection:
     # 'django.middleware.clickjacking.XFrameOptionsMiddleware',
@@ -154,3 +185,110 @@ LOGGING = {
         },
     }
 }
+
+# Number of counter rows a choice's votes are spread over on polls using
+# sharded vote counters.
+POLLS_VOTE_SHARDS = 8
+
+# Write-behind buffering of votes. When enabled, the poll view acknowledges
+# votes straight away and a background thread writes them every
+# FLUSH_INTERVAL_MS milliseconds, or once MAX_PENDING votes are waiting.
+# A crash loses at most MAX_PENDING votes per process, and while the
+# database is down votes beyond MAX_PENDING are dropped (and counted).
+POLLS_VOTE_BUFFER = {
+    'ENABLED': False,
+    'FLUSH_INTERVAL_MS': 500,
+    'MAX_PENDING': 100,
+}
+
+# Seconds a poll's cached results may be served. Votes and edits change
+# the results' cache key, so this only bounds memory use.
+POLLS_RESULTS_CACHE_TIMEOUT = 60 * 60
+
+# Number of polls listed per home page.
+POLLS_HOME_PAGE_SIZE = 50
+
+# Maximum number of polls a single JSON results request may ask for.
+POLLS_API_MAX_IDS = 100
+
+# Send per-request query count, SQL, render and wall times as X-Polls-*
+# response headers. They are always logged to the polls.metrics logger.
+# Query counts and SQL times make every query record its SQL, so they are
+# only collected with DEBUG or POLLS_METRICS_SQL on.
+POLLS_METRICS_HEADERS = DEBUG
+POLLS_METRICS_SQL = DEBUG
+
+# Connection setup applied to SQLite databases (see polls/db.py). WAL lets
+# page reads go on while a vote is written, BUSY_TIMEOUT_MS makes
+# concurrent writers wait for each other rather than fail with "database
+# is locked", and persistent connections are reused across a thread's
+# requests instead of being reopened every time.
+POLLS_SQLITE = {
+    'JOURNAL_MODE': 'WAL',
+    'SYNCHRONOUS': 'NORMAL',
+    'CACHE_SIZE_KB': 16 * 1024,
+    'BUSY_TIMEOUT_MS': 5000,
+    'PERSISTENT_CONNECTIONS': True,
+}
+
+# Database aliases that reads of polls models are spread over. Writes, and
+# every read of a client that wrote in the last POLLS_PIN_PRIMARY_SECONDS,
+# go to the default database.
+POLLS_DATABASE_REPLICAS = ()
+POLLS_PIN_PRIMARY_COOKIE = 'polls_primary'
+POLLS_PIN_PRIMARY_SECONDS = 10
+
+# Longest time, in seconds, a request to a poll's changes endpoint waits for
+# a vote, and how often it checks the poll's results version meanwhile.
+POLLS_LIVE_TIMEOUT = 25
+POLLS_LIVE_INTERVAL_MS = 250
+
+# Vote events younger than this many seconds are left out of rollups, so
+# that events of transactions still in flight are not skipped.
+POLLS_VOTE_EVENT_SETTLE_SECONDS = 5
+
+# Number of buckets a poll's vote history covers when no start is given,
+# and the most a single request may ask for.
+POLLS_HISTORY_DEFAULT_BUCKETS = 60
+POLLS_HISTORY_MAX_BUCKETS = 1000
+
+# Tables with at least this many rows are counted from the database's
+# estimate of their size on unfiltered admin changelists.
+POLLS_ADMIN_ESTIMATED_COUNT_ABOVE = 100000
+
+# Middleware run on POSTs to /poll/<id>/vote/ by the WSGI application in
+# tdd/wsgi.py. Votes need neither sessions, users nor messages.
+POLLS_VOTE_MIDDLEWARE_CLASSES = (
+    'polls.middleware.RequestMetricsMiddleware',
+    'polls.middleware.PinPrimaryMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+)
+
+# Number of polls per page of search results.
+POLLS_SEARCH_PAGE_SIZE = 20
+
+# Number of polls in the home page's most voted and trending lists, and
+# how many seconds the lists are cached for. A vote weighs half as much in
+# the trending list POLLS_TRENDING_HALF_LIFE seconds after it was cast.
+POLLS_LEADERBOARD_SIZE = 10
+POLLS_LEADERBOARD_PERIOD = 60
+POLLS_TRENDING_HALF_LIFE = 60 * 60
+
+# Profile a SAMPLE_RATE fraction of requests, and requests from staff
+# members that send the HEADER header, with cProfile. Stats are kept per
+# view and process for up to MAX_VIEWS views, and staff can read them at
+# /profiles/.
+POLLS_PROFILING = {
+    'ENABLED': True,
+    'SAMPLE_RATE': 0,
+    'HEADER': 'X-Polls-Profile',
+    'MAX_VIEWS': 100,
+}
+
+# Warm the results cache of this many hot polls when the WSGI application
+# starts, for at most POLLS_WARM_CACHES_BUDGET seconds. 0 turns it off.
+# With a shared cache, running the warm_caches command once per deploy is
+# cheaper. The local-memory cache is only warmed when POLLS_ALLOW_LOCAL_CACHE
+# is on (see CACHES): otherwise results are not cached at all.
+POLLS_WARM_CACHES_ON_START = 0
+POLLS_WARM_CACHES_BUDGET = 10
@@ -14,6 +14,16 @@ urlpatterns = patterns('',
 
     url(r'^$', 'polls.views.home'),
     url(r'^poll/(\d+)/$', 'polls.views.poll'),
+    url(r'^poll/(\d+)/vote/$', 'polls.views.vote'),
+    url(r'^api/polls/$', 'polls.views.api_polls'),
+    url(r'^api/search/$', 'polls.views.api_search'),
+    url(r'^api/poll/(\d+)/$', 'polls.views.api_poll'),
+    url(r'^api/poll/(\d+)/changes/$', 'polls.views.api_poll_changes'),
+    url(r'^api/poll/(\d+)/history/$', 'polls.views.api_poll_history'),
+    url(r'^export/polls\.(csv|ndjson)$', 'polls.views.export_polls'),
+    url(r'^profiles/$', 'polls.views.profile_index'),
+    url(r'^profiles/([\w.]+)/$', 'polls.views.profile_report'),
+    url(r'^profiles/([\w.]+)\.pstats$', 'polls.views.profile_dump'),
 
     # Uncomment the next line to enable the admin:
     url(r'^admin/', include(admin.site.urls)),
@@ -23,6 +23,20 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tdd.settings")
 from django.core.wsgi import get_wsgi_application
 application = get_wsgi_application()
 
+# Vote POSTs skip the session, auth and messages middleware.
+from polls.wsgi import vote_dispatcher
+application = vote_dispatcher(application)
+
+# Fill this process's caches before it serves its first request.
+from django.conf import settings
+from polls.cache import versions_shared
+if settings.POLLS_WARM_CACHES_ON_START and versions_shared():
+    from django.db import connection
+    from polls.warmup import warm_caches
+    warm_caches(settings.POLLS_WARM_CACHES_ON_START, workers=1,
+                budget=settings.POLLS_WARM_CACHES_BUDGET)
+    connection.close()
+
 # Apply WSGI middleware here.
 # from helloworld.wsgi import HelloWorldApplication
 # application = HelloWorldApplication(application)